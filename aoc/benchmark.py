@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+# # #
+# Benchmark solve_p1/solve_p2 of all (or selected) days on real data.
+#
+# > python -m aoc.benchmark 18 --save       # measure day 18, update baseline
+# > python -m aoc.benchmark --max-seconds 5 # compare fast parts to baseline
+#
+# Each part is run several times in the current process (one after another,
+# to avoid interference between parts), the best and the median times are
+# compared against the baseline stored in aoc/baseline.json. A part whose
+# best time exceeds the baseline by more than the threshold is reported as
+# a regression.
+#
+
+import os
+import sys
+import json
+import argparse
+import statistics
+from typing import List, Dict, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from aoc import runner
+
+
+# differences below this number of seconds are considered noise
+NOISE = 0.05
+
+
+def load_baseline(fname: Optional[str] = None) -> dict:
+    '''Load baseline timings: {day: {part: {'best': .., 'median': ..}}}'''
+    fname = fname or runner.BASELINE
+    if not os.path.exists(fname):
+        return {}
+    with open(fname) as fd:
+        return json.load(fd)
+
+
+def save_baseline(baseline: dict, fname: Optional[str] = None):
+    fname = fname or runner.BASELINE
+    with open(fname, 'w') as fd:
+        json.dump(baseline, fd, indent=2, sort_keys=True)
+        fd.write('\n')
+
+
+def measure(day: str, part: int, repeat: int = 3) -> dict:
+    '''Run given part <repeat> times, return timing statistics'''
+    seconds = []
+    for _ in range(repeat):
+        res = runner.run_part(day, part)
+        if res.expected is not None and res.expected != res.value:
+            raise ValueError(f"Wrong answer for day {day} p.{part}: "
+                             f"expected {res.expected}, got {res.value}")
+        seconds.append(res.seconds)
+    return {
+        'best': round(min(seconds), 4),
+        'median': round(statistics.median(seconds), 4),
+        'runs': len(seconds)
+    }
+
+
+def compare(stats: dict, base: Optional[dict], threshold: float) -> str:
+    '''Compare current timings to the baseline ones'''
+    if not base:
+        return 'NEW'
+    diff = stats['best'] - base['best']
+    if abs(diff) < NOISE:
+        return 'OK'
+    ratio = stats['best'] / base['best'] if base['best'] else float('inf')
+    if ratio > 1 + threshold:
+        return f'REGRESSION x{ratio:.2f}'
+    if ratio < 1 - threshold:
+        return f'FASTER x{1/ratio:.2f}'
+    return 'OK'
+
+
+def run(days: List[str], repeat: int = 3, threshold: float = 0.2,
+        max_seconds: Optional[float] = None) -> Dict[str, dict]:
+    '''Benchmark given days and print a report. Return new timings in
+    the baseline format'''
+    baseline = load_baseline()
+    timings = runner.load_timings()
+    results = {}
+
+    print(f"{'part':<10} {'best':>9} {'median':>9} {'baseline':>9}  status")
+    for day in days:
+        for part in (1, 2):
+            expected = timings.get((day, part),
+                                   runner.parts_of(day)[part-1].seconds)
+            if max_seconds is not None and expected > max_seconds:
+                print(f"{day} p.{part:<5} skipped, expected {expected}s")
+                continue
+            stats = measure(day, part, repeat)
+            base = baseline.get(day, {}).get(str(part))
+            status = compare(stats, base, threshold)
+            base_best = f"{base['best']:9.3f}" if base else f"{'-':>9}"
+            print(f"{day} p.{part:<5} {stats['best']:9.3f} "
+                  f"{stats['median']:9.3f} {base_best}  {status}")
+            results.setdefault(day, {})[str(part)] = stats
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark solutions and compare them to the baseline")
+    parser.add_argument('days', nargs='*',
+                        help='days to run, like 01 or 1 (default: all)')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='number of runs of each part (default: 3)')
+    parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                        help='relative slowdown considered a regression '
+                             '(default: 0.2)')
+    parser.add_argument('--max-seconds', type=float, default=None,
+                        help='skip parts expected to run longer than that')
+    parser.add_argument('--save', action='store_true',
+                        help='store the new timings in the baseline')
+    opts = parser.parse_args()
+
+    days = runner.select(runner.discover(), opts.days)
+    baseline = load_baseline()
+    results = run(days, opts.repeat, opts.threshold, opts.max_seconds)
+
+    regressions = [
+        (day, part) for day, parts in results.items()
+        for part, stats in parts.items()
+        if compare(stats, baseline.get(day, {}).get(part),
+                   opts.threshold).startswith('REGRESSION')
+    ]
+
+    if opts.save:
+        for day, parts in results.items():
+            baseline.setdefault(day, {}).update(parts)
+        save_baseline(baseline)
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+
+# # #
+# Run solutions of all (or selected) days in parallel.
+#
+# > python -m aoc.runner             # all days
+# > python -m aoc.runner 12 18 -j 4  # selected days, 4 worker processes
+#
+# Every part (solve_p1 or solve_p2 of a day) is a separate task. Tasks are
+# submitted to a pool of processes starting from the slowest ones, so that
+# the wall time approaches the time of the slowest single part instead of
+# the sum of all parts. Running times are taken from the benchmark baseline
+# (see aoc/benchmark.py) or, if absent, from the estimates in PUZZLES.
+#
+
+import os
+import io
+import sys
+import glob
+import json
+import time
+import argparse
+import importlib
+import contextlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Tuple, Optional, Callable
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from aoc import utils
+
+# timings measured by aoc/benchmark.py
+BASELINE = os.path.join(ROOT, 'aoc', 'baseline.json')
+
+
+# How to run a part of a day on the real data
+# * func -- name of the function in day_DD/solution.py
+# * args -- callable that receives lines of input.txt (None if the day has
+#           no input file) and returns arguments for <func>
+# * expected -- the correct answer, None if unknown
+# * seconds -- expected running time, used for scheduling
+Part = namedtuple('Part', ['func', 'args', 'expected', 'seconds'])
+
+# Number of processes that a solution may start itself. Parts are already
+# run in parallel, so the CPUs are shared between the workers of run()
+# instead of every solution starting a pool as big as the number of CPUs.
+# None (a solution run on its own) lets the solution decide.
+SOLUTION_WORKERS = None
+
+# The result of running a Part
+Result = namedtuple('Result', ['day', 'part', 'expected', 'value', 'seconds'])
+
+
+def all_lines(lines: List[str]) -> tuple:
+    return (lines,)
+
+
+def first_line(lines: List[str]) -> tuple:
+    return (lines[0],)
+
+
+def given(*args) -> Callable:
+    '''Arguments that do not depend on input.txt'''
+    return lambda lines: args
+
+
+def given_and_workers(*args) -> Callable:
+    '''Given arguments followed by the number of processes that the solution
+    may start itself (see SOLUTION_WORKERS)'''
+    return lambda lines: (*args, SOLUTION_WORKERS)
+
+
+def lines_and(*args) -> Callable:
+    '''Lines of input.txt followed by given arguments'''
+    return lambda lines: (lines, *args)
+
+
+def first_line_and(*args) -> Callable:
+    '''The 1st line of input.txt followed by given arguments'''
+    return lambda lines: (lines[0], *args)
+
+
+DAY_08_P2 = """\
+####..##...##..###...##..###..#..#.#...#.##...##..
+#....#..#.#..#.#..#.#..#.#..#.#..#.#...##..#.#..#.
+###..#..#.#..#.#..#.#....#..#.####..#.#.#..#.#..#.
+#....#..#.####.###..#.##.###..#..#...#..####.#..#.
+#....#..#.#..#.#.#..#..#.#....#..#...#..#..#.#..#.
+####..##..#..#.#..#..###.#....#..#...#..#..#..##.."""
+
+
+# The values are taken from run_real() of each day. A day that is not listed
+# here is run as solve_p1(lines) and solve_p2(lines) w/o checking the answer.
+PUZZLES = {
+    '01': (Part('solve_p1', first_line, 307, 0.01),
+           Part('solve_p2', first_line, 165, 0.5)),
+    '02': (Part('solve_p1', all_lines, '78985', 0.01),
+           Part('solve_p2', all_lines, '57DD8', 0.01)),
+    '03': (Part('solve_p1', all_lines, 862, 0.01),
+           Part('solve_p2', all_lines, 1577, 0.01)),
+    '04': (Part('solve_p1', all_lines, 137896, 0.05),
+           Part('solve_p2', all_lines, 501, 0.05)),
+    '05': (Part('solve_p1', given_and_workers('ojvtpuvg'), '4543c154', 16),
+           Part('solve_p2', given_and_workers('ojvtpuvg'), '1050cbbd', 46)),
+    '06': (Part('solve_p1', all_lines, 'afwlyyyq', 0.05),
+           Part('solve_p2', all_lines, 'bhkzekao', 0.05)),
+    '07': (Part('solve_p1', all_lines, 115, 0.2),
+           Part('solve_p2', all_lines, 231, 0.2)),
+    '08': (Part('solve_p1', all_lines, 128, 0.01),
+           Part('solve_p2', all_lines, DAY_08_P2, 0.01)),
+    '09': (Part('solve_p1', all_lines, 123908, 0.1),
+           Part('solve_p2', all_lines, 10755693147, 0.1)),
+    '10': (Part('solve_p1', lines_and((61, 17)), 98, 0.01),
+           Part('solve_p2', all_lines, 4042, 0.01)),
+    '12': (Part('solve_p1', all_lines, 318009, 0.01),
+           Part('solve_p2', all_lines, 9227663, 0.01)),
+    '13': (Part('solve_p1', given((31, 39), 1362), 82, 0.01),
+           Part('solve_p2', given((31, 39), 1362), 138, 0.01)),
+    # p.2 w/o the cache of hashes on disk, to time the hashing
+    '14': (Part('solve_p1', given('cuanljph'), 23769, 0.7),
+           Part('solve_p2', given_and_workers('cuanljph', False), 20606, 45)),
+    '15': (Part('solve_p1', all_lines, 400589, 0.01),
+           Part('solve_p2', all_lines, 3045959, 0.01)),
+    '16': (Part('solve_p1', given('11011110011011101', 272),
+                '00000100100001100', 0.01),
+           Part('solve_p1', given('11011110011011101', 35651584),
+                '00011010100010010', 10)),
+    '17': (Part('solve_p1', given('pslxynzg'), 'DDRRUDLRRD', 0.01),
+           Part('solve_p2', given('pslxynzg'), 488, 0.5)),
+    '18': (Part('solve_p1', first_line_and(40), 1987, 0.01),
+           Part('solve_p2', first_line, 19984714, 60)),
+    '20': (Part('solve_p1', all_lines, 32259706, 0.01),
+           Part('solve_p2', all_lines, 113, 0.01)),
+    '21': (Part('solve_p1', lines_and('abcdefgh'), 'agcebfdh', 0.01),
+           Part('solve_p2', lines_and('fbgdceah'), 'afhdbegc', 0.01)),
+    '23': (Part('solve_p1', lines_and(1), 12560, 0.2),
+           Part('solve_p2', all_lines, 479009120, 0.1)),
+}
+
+
+def discover(root: str = ROOT) -> List[str]:
+    '''Find all days that have a solution, return their numbers as strings'''
+    paths = glob.glob(os.path.join(root, 'day_*', 'solution.py'))
+    days = [os.path.basename(os.path.dirname(p))[4:] for p in paths]
+    return sorted(days)
+
+
+def select(days: List[str], wanted: List[str]) -> List[str]:
+    '''Select from <days> those that are <wanted>, like 01 or 1. All <days>
+    are selected if nothing is wanted.'''
+    if not wanted:
+        return days
+    wanted = [f'{int(d):02}' for d in wanted]
+    return [day for day in days if day in wanted]
+
+
+def load_timings(fname: str = BASELINE) -> Dict[Tuple[str, int], float]:
+    '''Load best running times of parts from the benchmark baseline'''
+    if not os.path.exists(fname):
+        return {}
+    with open(fname) as fd:
+        baseline = json.load(fd)
+    return {(day, int(part)): stats['best']
+            for day, parts in baseline.items()
+            for part, stats in parts.items()}
+
+
+def parts_of(day: str) -> Tuple[Part, Part]:
+    default = (Part('solve_p1', all_lines, None, 0),
+               Part('solve_p2', all_lines, None, 0))
+    return PUZZLES.get(day, default)
+
+
+def run_part(day: str, part: int) -> Result:
+    '''Run a single part of the given day. This function is executed in
+    a worker process.'''
+    task = parts_of(day)[part-1]
+    fname = os.path.join(ROOT, f'day_{day}', 'input.txt')
+    lines = utils.load_input(fname) if os.path.exists(fname) else None
+    # solutions print things (at import time or while solving)
+    with contextlib.redirect_stdout(io.StringIO()):
+        module = importlib.import_module(f'day_{day}.solution')
+        func = getattr(module, task.func)
+        args = task.args(lines)
+        t0 = time.perf_counter()
+        value = func(*args)
+        seconds = time.perf_counter() - t0
+    return Result(day, part, task.expected, value, seconds)
+
+
+def schedule(days: List[str],
+             timings: Optional[Dict[Tuple[str, int], float]] = None
+             ) -> List[Tuple[str, int]]:
+    '''Arrange parts of given days from the slowest to the fastest.
+    Expected running time is taken from <timings> if available and falls back
+    to the estimates in PUZZLES.'''
+    timings = timings or {}
+    tasks = [(day, part) for day in days for part in (1, 2)]
+
+    def expected_time(task):
+        day, part = task
+        return timings.get(task, parts_of(day)[part-1].seconds)
+
+    return sorted(tasks, key=expected_time, reverse=True)
+
+
+def _start_worker(solution_workers: int):
+    global SOLUTION_WORKERS
+    SOLUTION_WORKERS = solution_workers
+
+
+def run(days: List[str], workers: Optional[int] = None,
+        timings: Optional[Dict[Tuple[str, int], float]] = None
+        ) -> List[Result]:
+    '''Run both parts of given days in a pool of <workers> processes and
+    return the results sorted by day and part'''
+    results = []
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                             initargs=(max(1, os.cpu_count() // workers),)
+                             ) as executor:
+        futures = [executor.submit(run_part, day, part)
+                   for day, part in schedule(days, timings)]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return sorted(results, key=lambda r: (r.day, r.part))
+
+
+def report(results: List[Result]):
+    for res in results:
+        print(f"--- Day {res.day} p.{res.part} --- ({res.seconds:.2f}s)")
+        if res.expected is None:
+            print(None, res.value)
+        else:
+            print(res.expected == res.value, res.expected, res.value)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run solutions of all (or selected) days in parallel")
+    parser.add_argument('days', nargs='*',
+                        help='days to run, like 01 or 1 (default: all)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes (default: #CPUs)')
+    opts = parser.parse_args()
+
+    days = select(discover(), opts.days)
+
+    t0 = time.perf_counter()
+    results = run(days, opts.jobs, load_timings())
+    wall = time.perf_counter() - t0
+
+    report(results)
+    total = sum(res.seconds for res in results)
+    failed = [res for res in results
+              if res.expected is not None and res.expected != res.value]
+    print(f"--- {len(results)} parts, {len(failed)} failed ---")
+    print(f"wall {wall:.2f}s; sum of parts {total:.2f}s")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,7 @@
 
-from typing import List, Union, Tuple, Optional
+import os
+import mmap
+from typing import List, Union, Tuple, Optional, Iterable, Iterator
 
 
 def load_input(fname: Optional[str] = None) -> List[str]:
@@ -13,6 +15,29 @@ def load_input(fname: Optional[str] = None) -> List[str]:
     return lines
 
 
+def iter_input(fname: Optional[str] = None,
+               raw: bool = False) -> Iterator[Union[str, bytes]]:
+    """Lazy version of load_input(): yield lines of the file, either given or
+    default 'input.txt', one by one. The file is memory-mapped rather than
+    read, therefore only the current line is held in memory. If <raw> is
+    True, lines are yielded as bytes (copies of the mapped lines, that remain
+    valid after the file is closed), otherwise they are decoded to strings."""
+    fname = fname or 'input.txt'
+    with open(fname, 'rb') as fd:
+        size = os.fstat(fd.fileno()).st_size
+        if not size:
+            return  # empty file cannot be mapped
+        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            st = 0
+            while st < size:
+                end = mm.find(b'\n', st)
+                if end < 0:
+                    end = size
+                line = mm[st:end].strip()
+                yield line if raw else line.decode()
+                st = end + 1
+
+
 def group_lines(data: Union[str, List[str]]) -> List[List[str]]:
     """Make groups of lines: a group is a sequence of lines that are separated
     by an empty line from another group.
@@ -31,11 +56,30 @@ def group_lines(data: Union[str, List[str]]) -> List[List[str]]:
     return groups
 
 
+def iter_groups(lines: Iterable[str]) -> Iterator[List[str]]:
+    """Lazy version of group_lines(): yield groups of lines one by one.
+    Input <lines> is any iterable of lines, for example, iter_input()."""
+    group = []
+    for ln in lines:
+        if ln:
+            group.append(ln)
+        else:
+            yield group
+            group = []
+    yield group
+
+
 def to_numbers(lines: List[str]) -> List[int]:
     """Convert list of lines (strings) to list of ints"""
     return [int(line) for line in lines]
 
 
+def iter_numbers(lines: Iterable[str]) -> Iterator[int]:
+    """Lazy version of to_numbers(): yield ints one by one"""
+    for line in lines:
+        yield int(line)
+
+
 def minmax(numbers: List[int]) -> Tuple[int, int]:
     """Return min and max values from given list of integers"""
     return (min(numbers), max(numbers))
@@ -7,7 +7,7 @@
 import re
 import os
 import sys
-from typing import List
+from typing import Iterable
 from collections import deque
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
@@ -26,32 +26,35 @@ def is_valid_triangle(sides: list) -> bool:
     return all(checks)
 
 
-def solve_p1(lines: List[str]) -> int:
+def solve_p1(lines: Iterable[str]) -> int:
     """Solution to the 1st part of the challenge."""
-    checks = [is_valid_triangle(line.split()) for line in lines]
-    return checks.count(True)
+    return sum(is_valid_triangle(line.split()) for line in lines)
 
 
-def solve_p2(lines: List[str]) -> int:
+def solve_p2(lines: Iterable[str]) -> int:
     """Solution to the 2nd part of the challenge.
-    One triangle is three consecutive numbers in each column."""
-    numbers = []
+    One triangle is three consecutive numbers in each column.
+    Lines are consumed one by one, only three of them are kept in memory."""
+    cnt = 0
+    rows = []
     for line in lines:
-        numbers.extend(line.split())
-    checks = []
-    for s in range(0, len(numbers), 9):
-        # 9 elements is three lines forming a square of shape (3, 3):
+        if not line.strip():
+            continue
+        rows.append(line.split())
+        if len(rows) < 3:
+            continue
+        # three lines form a square of shape (3, 3):
         # a1 a2 a3
         # b1 b2 b3
         # c1 c2 c3
-        three = numbers[s:s+9]
-        for i in range(3):
-            # selecting 3 times with step 3 gives us triangles made of columns
-            # => a1 b1 c1  -- from the 1st column
-            # => a2 b2 c2  -- from the 2nd column
-            # => a3 b3 c3  -- from the 3rd column
-            checks.append(is_valid_triangle(three[i::3]))
-    return checks.count(True)
+        # and triangles are made of columns
+        # => a1 b1 c1  -- from the 1st column
+        # => a2 b2 c2  -- from the 2nd column
+        # => a3 b3 c3  -- from the 3rd column
+        for sides in zip(*rows):
+            cnt += is_valid_triangle(sides)
+        rows = []
+    return cnt
 
 
 tests = [
@@ -74,16 +77,15 @@ def run_tests():
 
 def run_real():
     day = '03'
-    lines = utils.load_input()
 
     print(f"--- Day {day} p.1 ---")
     exp1 = 862
-    res1 = solve_p1(lines)
+    res1 = solve_p1(utils.iter_input())
     print(exp1 == res1, exp1, res1)
 
     print(f"--- Day {day} p.2 ---")
     exp2 = 1577
-    res2 = solve_p2(lines)
+    res2 = solve_p2(utils.iter_input())
     print(exp2 == res2, exp2, res2)
 
 
@@ -7,7 +7,7 @@
 import re
 import os
 import sys
-from typing import List
+from typing import Iterable
 from collections import Counter
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
@@ -61,14 +61,13 @@ class ShiftCipher(object):
         return "".join(chars)
 
 
-def solve_p1(lines: List[str]) -> int:
+def solve_p1(lines: Iterable[str]) -> int:
     """Solution to the 1st part of the challenge"""
-    rooms = [Room(line) for line in lines]
-    valid_rooms = [room.sector_id for room in rooms if room.is_valid()]
-    return sum(valid_rooms)
+    rooms = (Room(line) for line in lines)
+    return sum(room.sector_id for room in rooms if room.is_valid())
 
 
-def solve_p2(lines: List[str]) -> int:
+def solve_p2(lines: Iterable[str]) -> int:
     """Solution to the 2nd part of the challenge"""
     for line in lines:
         room = Room(line)
@@ -106,16 +105,15 @@ def run_tests():
 
 def run_real():
     day = '04'
-    lines = utils.load_input()
 
     print(f"--- Day {day} p.1 ---")
     exp1 = 137896
-    res1 = solve_p1(lines)
+    res1 = solve_p1(utils.iter_input())
     print(exp1 == res1, exp1, res1)
 
     print(f"--- Day {day} p.2 ---")
     exp2 = 501
-    res2 = solve_p2(lines)
+    res2 = solve_p2(utils.iter_input())
     print(exp2 == res2, exp2, res2)
 
 
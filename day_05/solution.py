@@ -7,7 +7,11 @@
 import re
 import os
 import sys
-from typing import Callable
+import time
+from typing import List, Callable, Iterator, Optional
+from itertools import count
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 import hashlib
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
@@ -41,10 +45,11 @@ class Password(object):
         self.chars[int(pos)] = val
 
 
-def digests(prefix):
-    '''Generate suitable MD5 digests'''
-    idx = -1
-    while True:
+def digests1(prefix: str, start: int = 0, stop: Optional[int] = None):
+    '''Generate suitable MD5 digests for indices from <start> to <stop>
+    (not inclusive) or infinitely if <stop> is not given'''
+    idx = start - 1
+    while stop is None or idx + 1 < stop:
         idx += 1
         m = hashlib.md5()
         m.update(bytes(prefix + str(idx), 'utf8'))
@@ -53,17 +58,78 @@ def digests(prefix):
             yield(hexdig)
 
 
-def solve(line: str, compose: Callable) -> str:
-    '''Generic solver for both parts'''
+def digests2(prefix: str, start: int = 0, stop: Optional[int] = None):
+    '''Same as digests1() but faster:
+    - the prefix is hashed only once, and a copy of that MD5 object is
+      updated with the index;
+    - five leading zeros in hex are 20 leading zero bits, that are checked
+      in the raw digest, which is converted to hex only when it matches.
+    '''
+    primed = hashlib.md5(prefix.encode())
+    indices = count(start) if stop is None else range(start, stop)
+    for idx in indices:
+        m = primed.copy()
+        m.update(b'%d' % idx)
+        dig = m.digest()
+        if dig[0] == 0 and dig[1] == 0 and dig[2] < 16:
+            yield dig.hex()
+
+# hashes per second (see run_benchmark())
+# - digests1: 0.53M
+# - digests2: 1.06M
+
+
+def search(prefix: str, start: int, stop: int) -> List[str]:
+    '''Find all suitable MD5 digests in given range of indices.
+    This function is executed in a worker process.'''
+    return list(digests2(prefix, start, stop))
+
+
+def parallel_digests(prefix: str, workers: Optional[int] = None,
+                     chunksize: int = 100000) -> Iterator[str]:
+    '''
+    Same as digests2() but the range of indices is split into chunks that are
+    searched in a pool of <workers> processes. Digests are generated in
+    the order of indices nevertheless. Once the caller stops consuming
+    digests, the chunks that have not started yet are cancelled.
+    '''
+    workers = workers or os.cpu_count()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = deque()
+        start = 0
+        while True:
+            # keep all workers busy while the results of the oldest chunk
+            # are being consumed
+            while len(pending) < 2 * workers:
+                pending.append(
+                    executor.submit(search, prefix, start, start + chunksize))
+                start += chunksize
+            yield from pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def solve(line: str, compose: Callable, workers: Optional[int] = None) -> str:
+    '''Generic solver for both parts. Digests are searched in a pool of
+    <workers> processes (by default, as many as there are CPUs), unless
+    <workers> is 1.'''
+    workers = workers or os.cpu_count()
+    if workers > 1:
+        hexdigs = parallel_digests(line, workers)
+    else:
+        # hexdigs = digests1(line)
+        hexdigs = digests2(line)
     passwd = Password(8)
-    for hexdig in digests(line):
+    for hexdig in hexdigs:
         passwd = compose(passwd, hexdig)
         if len(passwd) >= 8:
             break
+    hexdigs.close()
     return str(passwd)
 
 
-def solve_p1(line: str) -> str:
+def solve_p1(line: str, workers: Optional[int] = None) -> str:
     """Solution to the 1st part of the challenge"""
 
     def composer(password, digest):
@@ -72,10 +138,10 @@ def solve_p1(line: str) -> str:
             print(f"Password: {password.chars} from {digest}")
         return res
 
-    return solve(line, composer)
+    return solve(line, composer, workers)
 
 
-def solve_p2(line: str) -> str:
+def solve_p2(line: str, workers: Optional[int] = None) -> str:
     """Solution to the 2nd part of the challenge"""
 
     def composer(password, digest):
@@ -86,7 +152,7 @@ def solve_p2(line: str) -> str:
                 print(f"Password: {password.chars} from {digest}")
         return password
 
-    return solve(line, composer)
+    return solve(line, composer, workers)
 
 
 tests = [
@@ -122,6 +188,18 @@ def run_real():
     print(exp2 == res2, exp2, res2)
 
 
+def run_benchmark():
+    print("--- Benchmark ---")
+    n = 2000000
+    for digests in [digests1, digests2]:
+        t0 = time.perf_counter()
+        hexdigs = list(digests('ojvtpuvg', 0, n))
+        seconds = time.perf_counter() - t0
+        print(f"{digests.__name__}: {n/seconds/1e6:.2f}M hashes/s,",
+              f"{len(hexdigs)} found")
+
+
 if __name__ == '__main__':
     run_tests()
     run_real()
+    # run_benchmark()
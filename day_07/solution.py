@@ -7,7 +7,7 @@
 import re
 import os
 import sys
-from typing import List
+from typing import Iterable
 from collections import defaultdict
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
@@ -59,16 +59,14 @@ def supports_ssl(ip: str) -> bool:
     return False
 
 
-def solve_p1(lines: List[str]) -> int:
+def solve_p1(lines: Iterable[str]) -> int:
     """Solution to the 1st part of the challenge"""
-    ips = [supports_tls(line) for line in lines]
-    return ips.count(True)
+    return sum(1 for line in lines if supports_tls(line))
 
 
-def solve_p2(lines: List[str]) -> int:
+def solve_p2(lines: Iterable[str]) -> int:
     """Solution to the 2nd part of the challenge"""
-    ips = [supports_ssl(line) for line in lines]
-    return ips.count(True)
+    return sum(1 for line in lines if supports_ssl(line))
 
 
 text_1 = """abba[mnop]qrst
@@ -104,16 +102,15 @@ def run_tests():
 
 def run_real():
     day = '07'
-    lines = utils.load_input()
 
     print(f"--- Day {day} p.1 ---")
     exp1 = 115
-    res1 = solve_p1(lines)
+    res1 = solve_p1(utils.iter_input())
     print(exp1 == res1, exp1, res1)
 
     print(f"--- Day {day} p.2 ---")
     exp2 = 231
-    res2 = solve_p2(lines)
+    res2 = solve_p2(utils.iter_input())
     print(exp2 == res2, exp2, res2)
 
 
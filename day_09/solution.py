@@ -7,7 +7,8 @@
 import re
 import os
 import sys
-from typing import List
+from bisect import bisect_right
+from typing import List, Iterator, TextIO, Optional
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from aoc import utils
@@ -15,26 +16,68 @@ from aoc import utils
 
 DEBUG = False
 
+MARKER = re.compile(r'\((\d+)x(\d+)\)')
+
 
 def decode(line: str) -> str:
     if DEBUG:
         print(f"Decoding: {line}")
-    decoded = ''
-    while line:
-        m = re.match(r'\((\d+)x(\d+)\)', line)
-        if m:
-            length, nreps = int(m.group(1)), int(m.group(2))
-            line = line[m.end():]
-            decoded += line[:length] * nreps
-            line = line[length:]
-        else:
-            decoded += line[0]
-            line = line[1:]
+    decoded = ''.join(iter_decode(line))
     if DEBUG:
         print(decoded)
     return decoded
 
 
+def iter_decode(line: str) -> Iterator[str]:
+    '''Decode the line (version 1) generating chunks of the decoded text:
+    runs of plain characters and single repetitions of marker data. Memory
+    does not depend on the number of repetitions.'''
+    pos = 0
+    while pos < len(line):
+        m = MARKER.match(line, pos)
+        if m:
+            length, nreps = int(m.group(1)), int(m.group(2))
+            data = line[m.end():m.end()+length]
+            for _ in range(nreps):
+                yield data
+            pos = m.end() + length
+        else:
+            end = line.find('(', pos + 1)
+            if end < 0:
+                end = len(line)
+            yield line[pos:end]
+            pos = end
+
+
+def decode_to(line: str, sink: TextIO) -> int:
+    '''Decode the line (version 1) writing the decoded text to a file-like
+    object. Return the number of characters written.'''
+    written = 0
+    for chunk in iter_decode(line):
+        written += sink.write(chunk)
+    return written
+
+
+def decoded_length(line: str) -> int:
+    '''Length of the line decoded with version 1, w/o decoding it'''
+    decoded_length = 0
+    pos = 0
+    while pos < len(line):
+        m = MARKER.match(line, pos)
+        if m:
+            length, nreps = int(m.group(1)), int(m.group(2))
+            length = min(length, len(line) - m.end())
+            decoded_length += length * nreps
+            pos = m.end() + length
+        else:
+            end = line.find('(', pos + 1)
+            if end < 0:
+                end = len(line)
+            decoded_length += end - pos
+            pos = end
+    return decoded_length
+
+
 def decode2(line: str) -> int:
     # ex: X(8x2)(3x3)ABCY -> XABCABCABCABCABCABCY
     # X (8x2)(3x3)ABC Y
@@ -57,19 +100,152 @@ def decode2(line: str) -> int:
     return decoded_length
 
 
+def decode3(line: str) -> int:
+    '''
+    Same as decode2() but in a single pass over the line, w/o copying it.
+    Every character is repeated as many times as the product of repetitions
+    of all markers whose data contain it. These markers are kept in a stack
+    as (end of data, product of repetitions); the data of a marker is
+    limited to the data of the enclosing marker, so the innermost marker
+    ends first.
+    A run of plain characters is counted at once, up to the next marker or
+    the end of the innermost marker.
+
+    real input: 0,011 --> 0,004
+    100000 plain characters: 0,28 --> 0,00004
+    4MB of random nested markers: 0,86
+    '''
+    decoded_length = 0
+    stack = []
+    pos = 0
+    while pos < len(line):
+        while stack and stack[-1][0] <= pos:
+            stack.pop()
+        limit, nreps = stack[-1] if stack else (len(line), 1)
+        m = MARKER.match(line, pos, limit)
+        if m:
+            end = min(m.end() + int(m.group(1)), limit)
+            stack.append((end, nreps * int(m.group(2))))
+            pos = m.end()
+        else:
+            end = line.find('(', pos + 1, limit)
+            if end < 0:
+                end = limit
+            decoded_length += (end - pos) * nreps
+            pos = end
+    return decoded_length
+
+
+class Segment(object):
+    '''A part of the compressed line that consists of pieces: runs of plain
+    characters and repeated (nested) segments'''
+    __slots__ = ('offsets', 'pieces', 'length')
+
+    def __init__(self):
+        # offsets of pieces in the decoded text
+        self.offsets = []
+        # (position in the line, None) for plain characters or
+        # (position of data in the line, Segment of data) for markers
+        self.pieces = []
+        self.length = 0
+
+    def append(self, pos: int, length: int,
+               data: Optional['Segment'] = None):
+        if length:
+            self.offsets.append(self.length)
+            self.pieces.append((pos, data))
+            self.length += length
+
+
+class DecodedIndex(object):
+    '''
+    Random access to the text decoded with version 2, w/o decoding it.
+    Markers are parsed recursively like in decode2() into a tree of
+    Segments, where every piece knows its offset in the decoded text. An
+    offset is located by bisecting the offsets at every level of nesting of
+    markers, a repeated segment is entered at the offset modulo its length.
+    '''
+
+    def __init__(self, line: str):
+        self.line = line
+        self.root = self._build(0, len(line))
+
+    def _build(self, start: int, end: int) -> Segment:
+        segment = Segment()
+        pos = start
+        while pos < end:
+            m = MARKER.match(self.line, pos, end)
+            if m:
+                length, nreps = int(m.group(1)), int(m.group(2))
+                stop = min(m.end() + length, end)
+                data = self._build(m.end(), stop)
+                segment.append(m.end(), data.length * nreps, data)
+                pos = stop
+            else:
+                stop = self.line.find('(', pos + 1, end)
+                if stop < 0:
+                    stop = end
+                segment.append(pos, stop - pos)
+                pos = stop
+        return segment
+
+    def __len__(self) -> int:
+        return self.root.length
+
+    def char_at(self, offset: int) -> str:
+        '''Return the character at given offset in the decoded text'''
+        if not 0 <= offset < len(self):
+            raise IndexError(f"Offset out of range: {offset}")
+        segment = self.root
+        while True:
+            idx = bisect_right(segment.offsets, offset) - 1
+            offset -= segment.offsets[idx]
+            pos, data = segment.pieces[idx]
+            if data is None:
+                return self.line[pos + offset]
+            segment, offset = data, offset % data.length
+
+    def range(self, start: int, end: int) -> str:
+        '''Return the decoded text in the range [start, end)'''
+        start, end = max(0, start), min(end, len(self))
+        return ''.join(self._iter_range(self.root, start, end))
+
+    def _iter_range(self, segment: Segment, start: int, end: int
+                    ) -> Iterator[str]:
+        idx = max(0, bisect_right(segment.offsets, start) - 1)
+        while idx < len(segment.pieces) and segment.offsets[idx] < end:
+            first = segment.offsets[idx]
+            if idx + 1 < len(segment.pieces):
+                last = segment.offsets[idx+1]
+            else:
+                last = segment.length
+            lo, hi = max(start, first) - first, min(end, last) - first
+            pos, data = segment.pieces[idx]
+            if data is None:
+                yield self.line[pos+lo:pos+hi]
+            else:
+                size = data.length
+                for rep in range(lo // size, (hi - 1) // size + 1):
+                    yield from self._iter_range(
+                        data, max(lo - rep * size, 0),
+                        min(hi - rep * size, size))
+            idx += 1
+
+
 def solve_p1(lines: List[str], part=1) -> int:
     """Solution to the 1st part of the challenge"""
-    decoded = [decode(line) for line in lines]
     if part == 0:
-        return decoded
+        return [decode(line) for line in lines]
     elif part == 1:
-        return sum([len(line) for line in decoded])
+        # return sum([len(decode(line)) for line in lines])
+        return sum(decoded_length(line) for line in lines)
     return 0
 
 
 def solve_p2(lines: List[str]) -> int:
     """Solution to the 2nd part of the challenge"""
-    decoded = [decode2(line) for line in lines]
+    # decoded = [decode2(line) for line in lines]
+    decoded = [decode3(line) for line in lines]
     return sum(decoded)
 
 
@@ -95,9 +271,25 @@ tests = [
 ]
 
 
+# line, decoded with version 2
+index_tests = [
+    ('ADVENT', 'ADVENT'),
+    ('(3x3)XYZ', 'XYZXYZXYZ'),
+    ('X(8x2)(3x3)ABCY', 'XABCABCABCABCABCABCY'),
+    ('A(7x2)(1x3)BCD', 'ABBBCBBBCD'),
+]
+
+
 def run_tests():
     print("--- Tests ---")
 
+    for tid, (inp, exp) in enumerate(index_tests):
+        index = DecodedIndex(inp)
+        res = ''.join(index.char_at(i) for i in range(len(index)))
+        print(f"T3.{tid}:", res == exp, exp, res)
+        res = index.range(2, 7)
+        print(f"T4.{tid}:", res == exp[2:7], exp[2:7], res)
+
     for tid, (inp, exp1, exp2) in enumerate(tests):
         if exp1 is not None:
             res1 = solve_p1(inp, part=0)
@@ -122,6 +314,9 @@ def run_real():
     res2 = solve_p2(lines)
     print(exp2 == res2, exp2, res2)
 
+    index = DecodedIndex(lines[0])
+    print(len(index) == exp2, index.range(exp2 - 20, exp2 + 20))
+
 
 if __name__ == '__main__':
     run_tests()
@@ -7,8 +7,10 @@
 import re
 import os
 import sys
-from typing import List
-from collections import defaultdict
+import time
+import random
+from typing import List, Optional
+from collections import defaultdict, deque
 from functools import reduce
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
@@ -42,8 +44,9 @@ class Bot(Bin):
         self.low = None
         self.high = None
 
-    def execute(self) -> bool:
-        '''Return status indicates whether the bot performed an action or not
+    def execute(self, ready: Optional[deque] = None) -> bool:
+        '''Return status indicates whether the bot performed an action or not.
+        The bots that got their second chip are added to the <ready> queue.
         '''
         status = False
         if len(self.chips) == 2:
@@ -52,6 +55,10 @@ class Bot(Bin):
             self.high.add(chips[1])
             self.chips.clear()
             status = True
+            if ready is not None:
+                for node in (self.low, self.high):
+                    if isinstance(node, Bot) and len(node.chips) == 2:
+                        ready.append(node)
         return status
 
     def __repr__(self):
@@ -98,16 +105,41 @@ def setup_botnet(lines: List[str]) -> dict:
     return nodes
 
 
-def solve_p1(lines: List[str], chips) -> int:
-    nodes = setup_botnet(lines)
-
+def sweep(nodes: dict, chips=None) -> Optional[Bot]:
+    '''Let bots act until none can act. Return the bot that compares given
+    <chips> as soon as it is found.
+    All bots are checked in every round, therefore the running time is
+    O(bots * rounds)'''
     keep_going = True
     while keep_going:
         keep_going = False
         for bot in nodes['bot'].values():
             if chips and chips in bot:
-                return bot.id   # part 1
+                return bot
             keep_going = bot.execute() or keep_going
+    return None
+
+
+def propagate(nodes: dict, chips=None) -> Optional[Bot]:
+    '''Same as sweep() but only bots that have two chips are processed:
+    they are kept in a queue, to which a bot adds the bots that got their
+    second chip from it. The running time is O(chips).'''
+    ready = deque(bot for bot in nodes['bot'].values() if len(bot.chips) == 2)
+    while ready:
+        bot = ready.popleft()
+        if chips and chips in bot:
+            return bot
+        bot.execute(ready)
+    return None
+
+
+def solve_p1(lines: List[str], chips) -> int:
+    nodes = setup_botnet(lines)
+
+    # bot = sweep(nodes, chips)
+    bot = propagate(nodes, chips)
+    if bot:
+        return bot.id   # part 1
 
     return nodes  # part 2
 
@@ -163,6 +195,57 @@ def run_real():
     print(exp2 == res2, exp2, res2)
 
 
+def generate_botnet(n_bots: int, seed: int = 0) -> List[str]:
+    '''
+    Generate instructions for a network of <n_bots> bots, in which every bot
+    gets two chips: one from the previous bot and another one from the input
+    or from a bot with a smaller id. Instructions of the bots are listed from
+    the last bot to the first one, which makes sweep() do a round per bot.
+    '''
+    rnd = random.Random(seed)
+    values = iter(rnd.sample(range(1, 10 * n_bots), 2 * n_bots))
+    pending = []  # (bot, low|high) that do not give to anyone yet
+    targets = {}
+    inputs = []
+    for bot in range(n_bots):
+        for n_chip in range(2):
+            if pending and (n_chip == 0 or rnd.random() < 0.5):
+                targets[pending.pop()] = f"bot {bot}"
+            else:
+                inputs.append(f"value {next(values)} goes to bot {bot}")
+        pending.extend([(bot, 'low'), (bot, 'high')])
+    for idx, source in enumerate(pending):
+        targets[source] = f"output {idx}"
+    return [f"bot {bot} gives low to {targets[(bot, 'low')]}"
+            f" and high to {targets[(bot, 'high')]}"
+            for bot in reversed(range(n_bots))] + inputs
+
+
+# Propagating chips through generated networks (see run_benchmark()),
+# sweep vs propagate:
+# 1000 bots: 0,12 vs 0,00
+# 10000 bots: 11,21 vs 0,02
+# 100000 bots: - vs 0,16
+# 1000000 bots: - vs 1,45
+
+
+def run_benchmark():
+    print("--- Benchmark ---")
+    for n_bots in [1000, 10000, 100000, 1000000]:
+        lines = generate_botnet(n_bots)
+        for func in [sweep, propagate]:
+            if func is sweep and n_bots > 10000:
+                continue
+            nodes = setup_botnet(lines)
+            t0 = time.perf_counter()
+            func(nodes)
+            seconds = time.perf_counter() - t0
+            outputs = sum(len(node.chips) for node in nodes['output'].values())
+            print(f"{n_bots} bots, {func.__name__}: {seconds:.2f}s,",
+                  f"{outputs} chips in outputs")
+
+
 if __name__ == '__main__':
     run_tests()
     run_real()
+    # run_benchmark()
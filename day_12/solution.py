@@ -7,18 +7,71 @@
 import re
 import os
 import sys
-from typing import List, Union
-from collections import defaultdict
+import copy
+import time
+import tempfile
+import struct
+from typing import List, Union, Optional, Callable, Tuple
+from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from aoc import utils
 
 
 DEBUG = False
+PROFILE = False
+
+# programs translated to python functions (see AssembunnyInterpreter.jit())
+JIT_CACHE = {}
+
+# the computer that every worker process of run_batch() starts from
+BATCH_COMPUTER = None
 
 
 class AssembunnyInterpreter(object):
 
+    REGISTERS = ('a', 'b', 'c', 'd')
+
+    # opcodes of compiled commands (see compile())
+    NOP, CPY, INC, DEC, JNZ, JNZR, ADD, MUL, CALL = range(9)
+
+    # run_compiled() checks the clock after this number of taken jumps
+    CLOCK_JUMPS = 100000
+
+    # Snapshots (see save()) start with the header (magic, version, position,
+    # whether the program was optimized, number of commands), followed by
+    # the values of registers. Every command is its name and number of
+    # arguments, every argument is a register (1 + index in REGISTERS) or
+    # a number (0 followed by the value). Values are unbounded integers
+    # stored as their length in bytes and the bytes (see _pack_number()).
+    SNAPSHOT_MAGIC = b'ASMB'
+    SNAPSHOT_VERSION = 2
+    SNAPSHOT_HEADER = struct.Struct('<4sBq?I')
+    SNAPSHOT_COMMAND = struct.Struct('<3sB')
+    SNAPSHOT_ARG = struct.Struct('<B')
+    SNAPSHOT_NUMBER = struct.Struct('<H')
+
+    # Blocks of commands recognized by optimize() and their replacements.
+    # Variables X, Y, Z match registers, N matches a register or a number,
+    # different variables match different values. Replacements have the same
+    # length as the original blocks, so that jumps over them do not change.
+    # Loops that start from copying a value to the counter, like
+    #   cpy 7 c; inc d; dec c; jnz c -2
+    # are handled by the add loop pattern.
+    PATTERNS = [
+        # nested loops: X += N * Z
+        ('cpy N Y; inc X; dec Y; jnz Y -2; dec Z; jnz Z -5',
+         'cpy N Y; mul Z Y; add Y X; cpy 0 Y; cpy 0 Z; jnz 0 0'),
+        ('cpy N Y; dec Y; inc X; jnz Y -2; dec Z; jnz Z -5',
+         'cpy N Y; mul Z Y; add Y X; cpy 0 Y; cpy 0 Z; jnz 0 0'),
+        # loop: X += Y
+        ('inc X; dec Y; jnz Y -2',
+         'add Y X; cpy 0 Y; jnz 0 0'),
+        ('dec Y; inc X; jnz Y -2',
+         'add Y X; cpy 0 Y; jnz 0 0'),
+    ]
+
     @staticmethod
     def parse_lines(lines: List[str]) -> List[tuple]:
         commands = []
@@ -33,8 +86,22 @@ class AssembunnyInterpreter(object):
         self.commands = commands
         self.registers = {'a': 0,  'b': 0, 'c': 0, 'd': 0}
         self.debug = False
+        self.profile = False
+        # counts collected by run() in profiling mode (see print_profile())
+        self.hits = Counter()
+        self.opcounts = Counter()
+        self.loops = Counter()
         self.pos = 0
         self.offset = 1  # jump
+        # optimized blocks as (start, end) and the commands they replaced,
+        # indexed by start of the block
+        self.optimized = False
+        self.blocks = []
+        self.original = {}
+        # loops summarized by optimize(), executed by `lin N` (see lin())
+        self.summaries = []
+        # positions of the commands changed since the last compilation
+        self.changed = set()
 
     def value(self, n: Union[str, int]) -> int:
         if isinstance(n, str):
@@ -53,6 +120,9 @@ class AssembunnyInterpreter(object):
     def jnz(self, cmd: tuple):
         if self.value(cmd[1]):
             self.offset = self.value(cmd[2])
+            if (self.blocks and isinstance(cmd[2], str)
+                    and self.fused(self.pos + self.offset, True)):
+                self.deoptimize(self.pos + self.offset)
 
     def inspect(self):
         print("--- computer state --")
@@ -64,9 +134,13 @@ class AssembunnyInterpreter(object):
     def run(self):
         self.pos = 0
         # self.inspect()
+        profile = self.profile
         while self.pos < len(self.commands):
             self.offset = 1
             cmd = self.commands[self.pos]
+            if profile:
+                self.hits[self.pos] += 1
+                self.opcounts[cmd[0]] += 1
             if self.debug:
                 print("--- Before ---")
                 print(self.pos, cmd)
@@ -76,13 +150,391 @@ class AssembunnyInterpreter(object):
                 meth(cmd)
             else:
                 raise ValueError(f"Unrecognized command: {cmd}")
+            if profile and self.offset < 0:
+                self.loops[(self.pos + self.offset, self.pos)] += 1
             self.pos += self.offset
             if self.debug:
                 print("--- After ---")
                 print("Registers:", self.registers)
                 print("Cursor at", self.pos)
+        if profile:
+            self.print_profile()
+        return self.registers
+
+    def print_profile(self, top: int = 10):
+        '''
+        Print counts collected by run() in profiling mode:
+        * executed commands by opcode,
+        * the most executed positions,
+        * the hottest loops, that is, backward jumps from the end of a loop
+          to its beginning, with the number of iterations and the number of
+          commands executed inside the loop. These are the candidates for
+          optimize().
+        '''
+        total = sum(self.opcounts.values()) or 1
+        print("--- Profile ---")
+        print(f"{'opcode':<8} {'count':>12} {'%':>6}")
+        for op, count in self.opcounts.most_common():
+            print(f"{op:<8} {count:12} {100*count/total:6.2f}")
+        print(f"{'total':<8} {total:12}")
+
+        print(f"{'pos':<6} {'command':<16} {'count':>12} {'%':>6}")
+        for pos, count in self.hits.most_common(top):
+            cmd = ' '.join(map(str, self.commands[pos]))
+            print(f"[{pos:>3}]  {cmd:<16} {count:12} {100*count/total:6.2f}")
+
+        print(f"{'loop':<12} {'iterations':>12} {'commands':>12} {'%':>6}"
+              "  fused")
+        loops = sorted(self.loops.items(), reverse=True,
+                       key=lambda item: sum(self.hits[pos] for pos in
+                                            range(item[0][0], item[0][1]+1)))
+        for (start, end), count in loops[:top]:
+            inside = sum(self.hits[pos] for pos in range(start, end+1))
+            fused = any(map(self.fused, range(start, end+1)))
+            print(f"[{start:>3}-{end:>3}]  {count:12} {inside:12}"
+                  f" {100*inside/total:6.2f}  {fused}")
+
+    def compile(self) -> List[tuple]:
+        '''
+        Translate commands into a list of (opcode, x, y) for run_compiled(),
+        where x and y are positions of arguments in the list of registers
+        followed by constants (self.constants). This way, arguments of any
+        kind are accessed in the same way, w/o checking their types.
+        Commands that cannot be executed (like `cpy 1 2`) become NOP,
+        commands that are not known (like `tgl`) become CALL, which means
+        they are executed by calling the method of the same name.
+        '''
+        self.constants = []
+        self.changed = set()
+        return [self._compile_command(cmd) for cmd in self.commands]
+
+    def recompile(self, code: List[tuple]) -> List[tuple]:
+        '''Update compiled commands in place, only those that changed since
+        the previous compilation. New constants (if any) are appended to
+        self.constants.'''
+        for pos in self.changed:
+            code[pos] = self._compile_command(self.commands[pos])
+        self.changed = set()
+        return code
+
+    def _compile_command(self, cmd: tuple) -> tuple:
+        opcodes = {'cpy': self.CPY, 'inc': self.INC, 'dec': self.DEC,
+                   'jnz': self.JNZ, 'add': self.ADD, 'mul': self.MUL}
+        opcode = opcodes.get(cmd[0], self.CALL)
+        if opcode == self.CALL:
+            return (opcode, 0, 0)
+        args = [self._slot(arg) for arg in cmd[1:]] + [0]
+        if opcode == self.JNZ:
+            if isinstance(cmd[2], str):
+                # may jump inside an optimized block
+                opcode = self.JNZR
+        elif not isinstance(cmd[-1], str):
+            # target is not a register
+            return (self.NOP, 0, 0)
+        return (opcode, args[0], args[1])
+
+    def _slot(self, arg: Union[str, int]) -> int:
+        if isinstance(arg, str):
+            return self.REGISTERS.index(arg)
+        if arg not in self.constants:
+            self.constants.append(arg)
+        return len(self.REGISTERS) + self.constants.index(arg)
+
+    def run_compiled(self, start: int = 0, checkpoint: Optional[str] = None,
+                     every: float = 60, max_seconds: Optional[float] = None):
+        '''
+        Same as run() but executes compiled commands (see compile()) in
+        a loop that does not call any methods and keeps registers in a list.
+        Execution starts from given position, which allows continuing
+        a snapshot (see resume()).
+        If <checkpoint> file is given, the state is saved to it every <every>
+        seconds and at the end. If <max_seconds> is given, execution stops
+        after that time, then self.pos is where it should be continued from.
+        The clock is checked on taken jumps (see CLOCK_JUMPS).
+        '''
+        NOP, CPY, INC, DEC, JNZ, JNZR, ADD, MUL, CALL = range(9)
+        code = self.compile()
+        regs = [self.registers[r] for r in self.REGISTERS] + self.constants
+        nregs = len(self.REGISTERS)
+        pc, n = start, len(code)
+        timed = checkpoint is not None or max_seconds is not None
+        jumps = self.CLOCK_JUMPS
+        t0 = saved = time.monotonic()
+        while pc < n:
+            op, x, y = code[pc]
+            if op == JNZ:
+                if regs[x]:
+                    pc += regs[y]
+                    if timed:
+                        jumps -= 1
+                        if not jumps:
+                            jumps = self.CLOCK_JUMPS
+                            now = time.monotonic()
+                            self.pos = pc
+                            self.registers.update(zip(self.REGISTERS, regs))
+                            if (max_seconds is not None
+                                    and now - t0 > max_seconds):
+                                if checkpoint:
+                                    self.save(checkpoint)
+                                return self.registers
+                            if checkpoint and now - saved > every:
+                                self.save(checkpoint)
+                                saved = now
+                    continue
+            elif op == INC:
+                regs[x] += 1
+            elif op == DEC:
+                regs[x] -= 1
+            elif op == CPY:
+                regs[y] = regs[x]
+            elif op == ADD:
+                regs[y] += regs[x]
+            elif op == MUL:
+                regs[y] *= regs[x]
+            elif op == JNZR:
+                if regs[x]:
+                    pc += regs[y]
+                    if self.blocks and self.fused(pc, True):
+                        self.deoptimize(pc)
+                        self.recompile(code)
+                        regs[nregs:] = self.constants
+                    continue
+            elif op == CALL:
+                # executed by the interpreter, that can modify commands
+                self.registers.update(zip(self.REGISTERS, regs))
+                self.pos, self.offset = pc, 1
+                cmd = self.commands[pc]
+                getattr(self, cmd[0])(cmd)
+                pc += self.offset
+                self.recompile(code)
+                regs = ([self.registers[r] for r in self.REGISTERS]
+                        + self.constants)
+                continue
+            pc += 1
+        self.pos = pc
+        self.registers.update(zip(self.REGISTERS, regs[:nregs]))
+        if checkpoint:
+            self.save(checkpoint)
+        return self.registers
+
+    def save(self, fname: str):
+        '''
+        Save the state of the computer: registers, position and unoptimized
+        commands (as modified by `tgl`) to a binary file (see SNAPSHOT_*).
+        The position must not be inside an optimized block. The file is
+        replaced atomically, so that an interrupted save does not destroy
+        the previous snapshot.
+        '''
+        commands = list(self.commands)
+        for start, original in self.original.items():
+            commands[start:start+len(original)] = original
+        chunks = [self.SNAPSHOT_HEADER.pack(
+            self.SNAPSHOT_MAGIC, self.SNAPSHOT_VERSION, self.pos,
+            self.optimized, len(commands))]
+        for r in self.REGISTERS:
+            chunks.append(self._pack_number(self.registers[r]))
+        for cmd in commands:
+            chunks.append(self.SNAPSHOT_COMMAND.pack(
+                cmd[0].encode(), len(cmd) - 1))
+            for arg in cmd[1:]:
+                if isinstance(arg, str):
+                    chunks.append(self.SNAPSHOT_ARG.pack(
+                        1 + self.REGISTERS.index(arg)))
+                else:
+                    chunks.append(self.SNAPSHOT_ARG.pack(0))
+                    chunks.append(self._pack_number(arg))
+        with open(fname + '.tmp', 'wb') as fd:
+            fd.write(b''.join(chunks))
+        os.replace(fname + '.tmp', fname)
+
+    @classmethod
+    def load(cls, fname: str) -> 'AssembunnyInterpreter':
+        '''Create a computer from the snapshot saved by save()'''
+        with open(fname, 'rb') as fd:
+            data = fd.read()
+        magic, version, pos, optimized, size = \
+            cls.SNAPSHOT_HEADER.unpack_from(data)
+        if magic != cls.SNAPSHOT_MAGIC or version != cls.SNAPSHOT_VERSION:
+            raise ValueError(f"Not a snapshot: {fname}")
+        offset = cls.SNAPSHOT_HEADER.size
+        values = []
+        for _ in cls.REGISTERS:
+            value, offset = cls._unpack_number(data, offset)
+            values.append(value)
+        commands = []
+        for _ in range(size):
+            name, nargs = cls.SNAPSHOT_COMMAND.unpack_from(data, offset)
+            offset += cls.SNAPSHOT_COMMAND.size
+            cmd = [name.decode()]
+            for _ in range(nargs):
+                reg, = cls.SNAPSHOT_ARG.unpack_from(data, offset)
+                offset += cls.SNAPSHOT_ARG.size
+                if reg:
+                    cmd.append(cls.REGISTERS[reg-1])
+                else:
+                    value, offset = cls._unpack_number(data, offset)
+                    cmd.append(value)
+            commands.append(tuple(cmd))
+        computer = cls(commands)
+        computer.registers.update(zip(cls.REGISTERS, values))
+        computer.pos = pos
+        if optimized:
+            computer.optimize()
+            if computer.fused(pos, True):
+                # the block was deoptimized when the snapshot was taken
+                computer.deoptimize(pos)
+        return computer
+
+    @classmethod
+    def _pack_number(cls, value: int) -> bytes:
+        '''Pack an integer of any size as its length and signed bytes'''
+        size = value.bit_length() // 8 + 1
+        return (cls.SNAPSHOT_NUMBER.pack(size)
+                + value.to_bytes(size, 'little', signed=True))
+
+    @classmethod
+    def _unpack_number(cls, data: bytes, offset: int) -> Tuple[int, int]:
+        '''Unpack an integer packed by _pack_number() at given offset.
+        Return the integer and the offset past it.'''
+        size, = cls.SNAPSHOT_NUMBER.unpack_from(data, offset)
+        offset += cls.SNAPSHOT_NUMBER.size
+        value = int.from_bytes(data[offset:offset+size], 'little', signed=True)
+        return value, offset + size
+
+    @classmethod
+    def resume(cls, fname: str, every: float = 60,
+               max_seconds: Optional[float] = None
+               ) -> 'AssembunnyInterpreter':
+        '''
+        Continue execution saved in the snapshot, saving checkpoints to the
+        same file. Return the computer, that has finished if its position is
+        past the last command, otherwise it can be resumed again:
+        > computer = AssembunnyInterpreter.resume(fname, max_seconds=600)
+        '''
+        computer = cls.load(fname)
+        computer.run_compiled(computer.pos, fname, every, max_seconds)
+        return computer
+
+    def jit(self) -> Optional[Callable]:
+        '''
+        Translate commands into a python function that keeps registers in
+        local variables (see jit_source()) and compile it. The functions are
+        cached by the program, so that the same program is compiled once.
+        Return None if the program cannot be translated.
+        '''
+        key = tuple(self.commands)
+        if key not in JIT_CACHE:
+            source = self.jit_source()
+            if self.debug:
+                print(source)
+            func = None
+            if source is not None:
+                namespace = {}
+                exec(compile(source, '<assembunny>', 'exec'), namespace)
+                func = namespace['program']
+            JIT_CACHE[key] = func
+        return JIT_CACHE[key]
+
+    def jit_source(self) -> Optional[str]:
+        '''
+        Generate the source of a python function that executes commands.
+        The program is split into basic blocks, each block becomes
+        straight-line code under `if pc == START:`. A block falls through to
+        the next one w/o any dispatching, jumps restart the dispatching loop.
+        A block that jumps back to its own beginning (a loop like
+        `inc a; dec b; jnz b -2`) becomes a `while` loop.
+        Programs that can change themselves (`tgl`) or that jump by offsets
+        stored in registers are not translated, None is returned.
+        '''
+        statements = {'cpy': '{2} = {1}', 'inc': '{1} += 1', 'dec': '{1} -= 1',
+                      'add': '{2} += {1}', 'mul': '{2} *= {1}'}
+        commands = self.commands
+        size = len(commands)
+        starts = {0}
+        for pos, cmd in enumerate(commands):
+            if cmd[0] == 'jnz':
+                if isinstance(cmd[2], str):
+                    return None
+                starts.update([pos + 1, pos + cmd[2]])
+            elif cmd[0] not in statements:
+                return None
+            if any(isinstance(arg, str) and arg not in self.REGISTERS
+                   for arg in cmd[1:]):
+                return None
+        starts = sorted(pos for pos in starts if 0 <= pos < size)
+
+        lines = ['def program(a, b, c, d):',
+                 '    pc = 0',
+                 '    while True:']
+        for start, end in zip(starts, starts[1:] + [size]):
+            lines.append(f'        if pc == {start}:')
+            indent = ' ' * 12
+            block, last = commands[start:end], commands[end-1]
+            jump = None
+            if last[0] == 'jnz':
+                block, jump = block[:-1], (last[1], end - 1 + last[2])
+            if jump and jump[1] == start:
+                lines.append(f'{indent}while True:')
+                indent += ' ' * 4
+            for cmd in block:
+                if isinstance(cmd[-1], str):
+                    lines.append(indent + statements[cmd[0]].format(*cmd))
+            if jump and jump[1] == start:
+                lines.append(f'{indent}if not {jump[0]}:')
+                lines.append(f'{indent}    break')
+                indent = indent[:-4]
+            elif jump and isinstance(jump[0], str):
+                lines.append(f'{indent}if {jump[0]}:')
+                lines.append(f'{indent}    pc = {jump[1]}')
+                lines.append(f'{indent}    continue')
+            elif jump and jump[0]:
+                lines.append(f'{indent}pc = {jump[1]}')
+                lines.append(f'{indent}continue')
+                continue
+            lines.append(f'{indent}pc = {end}')
+        lines.append('        break')
+        lines.append('    return pc, a, b, c, d')
+        return '\n'.join(lines) + '\n'
+
+    def run_jit(self):
+        '''Same as run() but executes the program translated to a python
+        function (see jit()). Programs that cannot be translated are executed
+        by run_compiled().'''
+        func = self.jit()
+        if func is None:
+            return self.run_compiled()
+        self.pos, *values = func(**self.registers)
+        self.registers.update(zip(self.REGISTERS, values))
         return self.registers
 
+    @classmethod
+    def run_batch(cls, commands: List[tuple], inits: List[dict],
+                  workers: Optional[int] = None, optimize: bool = True
+                  ) -> List[Tuple[dict, dict]]:
+        '''
+        Run the program with each of the initial values of registers, like
+        > run_batch(commands, [{'a': 7}, {'a': 12}])
+        The program is optimized once (unless <optimize> is False), each run
+        starts from a copy of the optimized computer. Runs are distributed
+        over a pool of <workers> processes (by default, as many as there are
+        CPUs), unless <workers> is 1.
+        Return pairs (initial registers, final registers) in the order of
+        <inits>.
+        '''
+        computer = cls(list(commands))
+        if optimize:
+            computer.optimize()
+        workers = workers or os.cpu_count()
+        if workers > 1 and len(inits) > 1:
+            with ProcessPoolExecutor(max_workers=workers,
+                                     initializer=_start_batch,
+                                     initargs=(computer,)) as executor:
+                results = list(executor.map(_run_batch, inits))
+        else:
+            _start_batch(computer)
+            results = [_run_batch(init) for init in inits]
+        return list(zip(inits, results))
+
     def add(self, cmd: tuple):
         '''operation `add ARG1 TRG`'''
         self.registers[cmd[2]] = self.value(cmd[1]) + self.value(cmd[2])
@@ -91,37 +543,228 @@ class AssembunnyInterpreter(object):
         '''operation `mul ARG1 TRG`'''
         self.registers[cmd[2]] = self.value(cmd[1]) * self.value(cmd[2])
 
-    def optimize(self):
-        '''Replace some blocks with other operations.'''
-        if self.debug:
-            print("--- optimizing ---")
-        self._rewrite_loop_as_sum()
-        #self._rewrite_nested_loops_as_multiplication()
+    def replace(self, pos: int, commands: List[tuple]):
+        '''Replace commands starting from given position'''
+        self.commands[pos:pos+len(commands)] = commands
+        self.changed.update(range(pos, pos+len(commands)))
 
-    def _rewrite_loop_as_sum(self):
+    def optimize(self, start: int = 0, end: Optional[int] = None):
         '''
-        [21]: ('inc', 'a')        --> add d a     // k-th line
-        [22]: ('dec', 'd')        --> cpy d 0     // l-th line
-        [23]: ('jnz', 'd', -2)    --> jnz 0 0     // m-th line
+        Replace blocks of commands that match PATTERNS with other operations.
+        Other loops are replaced with their summaries if possible (see
+        summarize()). Only blocks that start in the range [start, end) are
+        considered.
+        A block is not replaced if there is a jump inside it from elsewhere.
+        Jumps whose offsets are in registers and `tgl` (day 23) can do that
+        at runtime, therefore original commands are kept in order to undo
+        optimization of the affected blocks (see deoptimize()).
 
         Due to this optimization, runnning time decreases:
         * user 23,97 --> 0,05
         '''
+        if self.debug:
+            print("--- optimizing ---")
+        self.optimized = True
+        patterns = [(self.parse_lines(p.split(';')),
+                     self.parse_lines(r.split(';')))
+                    for p, r in self.PATTERNS]
+        pos = max(0, start)
+        if end is None or end > len(self.commands):
+            end = len(self.commands)
+        while pos < end:
+            for pattern, replacement in patterns:
+                bindings = self._match(pattern, pos)
+                if bindings is not None and self._fuse(pos, [
+                        tuple(bindings.get(arg, arg) for arg in cmd)
+                        for cmd in replacement]):
+                    pos += len(pattern)
+                    break
+            else:
+                summary = self.summarize(pos)
+                if summary and self._fuse(pos, summary):
+                    pos += len(summary)
+                else:
+                    pos += 1
+
+    def _fuse(self, pos: int, commands: List[tuple]) -> bool:
+        '''Replace the block that starts at given position with given commands
+        unless the block overlaps another one or can be jumped in'''
+        last = pos + len(commands)
+        if (any(map(self.fused, range(pos, last)))
+                or self._jumps_inside(pos, last)):
+            return False
+        self.original[pos] = self.commands[pos:last]
+        self.blocks.append((pos, last))
+        self.replace(pos, commands)
+        if self.debug:
+            print("Optimized", pos, self.commands[pos:last])
+        return True
 
-        for m, cmd_m in enumerate(self.commands):
-            if m > 1 and cmd_m[0] == 'jnz' and cmd_m[2] == -2:
-                # print(m, cmd_m)
-                k, l = m - 2, m - 1
-                cmd_k = self.commands[k]
-                cmd_l = self.commands[l]
-                if (cmd_k[0] == 'inc' and cmd_l[0] == 'dec'
-                    and cmd_l[1] == cmd_m[1]):
-                    _cmd_k = ('add', cmd_l[1], cmd_k[1])
-                    _cmd_l = ('cpy', 0, cmd_l[1])
-                    _cmd_m = ('jnz', 0, 0)
-                    self.commands[k] = _cmd_k
-                    self.commands[l] = _cmd_l
-                    self.commands[m] = _cmd_m
+    def summarize(self, pos: int) -> Optional[List[tuple]]:
+        '''
+        Summarize the innermost loop that starts at given position: the loop
+        body consists of inc/dec/cpy/add and is followed by `jnz R -N` that
+        jumps back to the position.
+        Every register after an iteration is a linear function of register
+        values before it. The loop is summarized if every register X
+        changed by the loop is
+          X' = X + f(invariants) or X' = f(invariants),
+        where f is a linear function of registers that the loop does not
+        change. The counter R then changes by the same value every iteration
+        and the number of iterations can be computed from its value when
+        the loop starts (see lin()).
+        The loop is replaced with `lin K` followed by `jnz 0 0`, where K is
+        the index of the summary in self.summaries.
+        Return None if the loop cannot be summarized.
+        '''
+        last = pos
+        while (last < len(self.commands)
+               and self.commands[last][0] in ('inc', 'dec', 'cpy', 'add')):
+            last += 1
+        if last == pos or last >= len(self.commands):
+            return None
+        jump = self.commands[last]
+        if (jump[0] != 'jnz' or jump[1] not in self.REGISTERS
+                or jump[2] != pos - last):
+            return None
+
+        # linear functions as {register: coefficient}, the constant term
+        # is under 1
+        state = {r: {r: 1} for r in self.REGISTERS}
+
+        def term(arg):
+            if isinstance(arg, str):
+                return dict(state[arg]) if arg in state else None
+            return {1: arg}
+
+        def plus(f, g):
+            h = dict(f)
+            for k, v in g.items():
+                h[k] = h.get(k, 0) + v
+            return {k: v for k, v in h.items() if v}
+
+        for cmd in self.commands[pos:last]:
+            if cmd[-1] not in state:
+                # the target is not a register, the command is skipped
+                continue
+            args = [term(arg) for arg in cmd[1:]]
+            if None in args:
+                return None
+            if cmd[0] == 'inc':
+                state[cmd[1]] = plus(args[0], {1: 1})
+            elif cmd[0] == 'dec':
+                state[cmd[1]] = plus(args[0], {1: -1})
+            elif cmd[0] == 'cpy':
+                state[cmd[2]] = args[0]
+            elif cmd[0] == 'add':
+                state[cmd[2]] = plus(args[1], args[0])
+
+        changed = {r for r, f in state.items() if f != {r: 1}}
+        effects = {}
+        for r in changed:
+            f = dict(state[r])
+            coef = f.pop(r, 0)
+            if coef not in (0, 1) or any(k in changed for k in f):
+                return None
+            effects[r] = (coef, f)
+        if jump[1] not in effects:
+            return None
+
+        self.summaries.append((jump[1], effects, last + 1 - pos))
+        return ([('lin', len(self.summaries) - 1)]
+                + [('jnz', 0, 0)] * (last - pos))
+
+    def lin(self, cmd: tuple):
+        '''
+        operation `lin K`: execute the loop summarized as self.summaries[K]
+        (see summarize()). If the loop never ends, the original commands are
+        restored and executed instead.
+        '''
+        counter, effects, length = self.summaries[cmd[1]]
+
+        def value(f):
+            return sum(v * (1 if k == 1 else self.registers[k])
+                       for k, v in f.items())
+
+        coef, f = effects[counter]
+        step = value(f)
+        times = None
+        if coef == 0:
+            # the counter gets the same value every iteration
+            times = 1 if step == 0 else None
+        elif step and -self.registers[counter] % step == 0:
+            times = -self.registers[counter] // step
+        if not times or times < 1:
+            self.deoptimize(self.pos)
+            self.offset = 0
+            return
+        values = {r: (coef * self.registers[r]
+                     + (times if coef else 1) * value(f))
+                  for r, (coef, f) in effects.items()}
+        self.registers.update(values)
+        self.offset = length
+
+    def _match(self, pattern: List[tuple], pos: int) -> Optional[dict]:
+        '''Match the pattern against commands starting at given position,
+        return values of the variables or None if it does not match.'''
+        bindings = {}
+        cmds = self.commands[pos:pos+len(pattern)]
+        if len(cmds) < len(pattern):
+            return None
+        for pcmd, cmd in zip(pattern, cmds):
+            if len(pcmd) != len(cmd) or pcmd[0] != cmd[0]:
+                return None
+            for parg, arg in zip(pcmd[1:], cmd[1:]):
+                if isinstance(parg, int):
+                    if parg != arg:
+                        return None
+                elif parg in bindings:
+                    if bindings[parg] != arg:
+                        return None
+                elif arg in bindings.values():
+                    return None
+                elif parg == 'N' or isinstance(arg, str):
+                    bindings[parg] = arg
+                else:
+                    return None
+        return bindings
+
+    def _jumps_inside(self, start: int, end: int) -> bool:
+        '''Check if any command outside of given block jumps inside it'''
+        for pos, cmd in enumerate(self.commands):
+            if (cmd[0] == 'jnz' and not start <= pos < end
+                    and isinstance(cmd[2], int)
+                    and start < pos + cmd[2] < end):
+                return True
+        return False
+
+    def fused(self, pos: int, inner: bool = False) -> bool:
+        '''Tell if given position belongs to an optimized block. Jumping to
+        the beginning of a block is ok, to check if the position is <inner>,
+        the beginning is excluded.'''
+        return any(start + inner <= pos < end for start, end in self.blocks)
+
+    def deoptimize(self, pos: Optional[int] = None):
+        '''Restore original commands of the optimized block that contains
+        given position or of all blocks if the position is not given'''
+        for start, end in list(self.blocks):
+            if pos is None or start <= pos < end:
+                if self.debug:
+                    print("Deoptimized", start, self.original[start])
+                self.replace(start, self.original.pop(start))
+                self.blocks.remove((start, end))
+
+
+def _start_batch(computer: AssembunnyInterpreter):
+    global BATCH_COMPUTER
+    BATCH_COMPUTER = computer
+
+
+def _run_batch(registers: dict) -> dict:
+    '''Run a copy of BATCH_COMPUTER with given initial registers'''
+    computer = copy.deepcopy(BATCH_COMPUTER)
+    computer.registers.update(registers)
+    return computer.run_compiled()
 
 
 #https://www.reddit.com/r/adventofcode/comments/5jvbzt/2016_day_23_solutions/
@@ -145,6 +788,7 @@ def solve_p1(lines: List[str], part=1) -> int:
 
     computer = AssembunnyInterpreter(commands)
     computer.debug = DEBUG
+    computer.profile = PROFILE
 
     if part == 2:
         computer.registers['c'] = 1
@@ -152,7 +796,13 @@ def solve_p1(lines: List[str], part=1) -> int:
     # computer.inspect()
     computer.optimize()
     # computer.inspect()
-    computer.run()
+    if computer.profile:
+        # only the interpreter collects counts
+        computer.run()
+    else:
+        # computer.run()
+        # computer.run_jit()
+        computer.run_compiled()
 
     return computer.registers['a']
 
@@ -184,16 +834,88 @@ add b a
 mul 10 a
 """
 
+# nested loops that are optimized to multiplication
+text_4 = """cpy 3 b
+cpy 4 d
+cpy d c
+inc a
+dec c
+jnz c -2
+dec b
+jnz b -5
+"""
+
+# jumps inside the loop that is optimized to addition
+text_5 = """cpy 5 d
+cpy 3 c
+jnz 1 c
+inc a
+dec d
+jnz d -2
+"""
+
+# loops that are summarized
+text_6 = """cpy 4 b
+cpy 2 c
+inc a
+inc a
+dec b
+cpy 5 d
+add c a
+jnz b -5
+cpy -3 b
+inc a
+inc b
+jnz b -2
+"""
+
 tests = [
     (text_1.split('\n'), 42, None),
     (text_2.split('\n'), 15, None),
     (text_3.split('\n'), 50, None),
+    (text_4.split('\n'), 12, None),
+    (text_5.split('\n'), 5, None),
+    (text_6.split('\n'), 19, None),
+]
+
+
+# jumps inside the nested loops, that are deoptimized at runtime
+text_7 = """cpy 4 d
+cpy 2 c
+jnz 1 c
+cpy 4 d
+inc a
+dec d
+jnz d -2
+dec b
+jnz b -5
+"""
+
+# programs, initial registers and the expected value of a. The program is
+# stopped at the first jump, saved and resumed (see resume())
+snapshot_tests = [
+    (text_7.split('\n'), {'b': 3}, 12),
+    (text_7.split('\n'), {'a': -2**70, 'b': 3}, 12 - 2**70),
 ]
 
 
 def run_tests():
     print("--- Tests ---")
 
+    for tid, (inp, registers, exp) in enumerate(snapshot_tests):
+        with tempfile.TemporaryDirectory() as dirname:
+            fname = os.path.join(dirname, 'snapshot')
+            computer = AssembunnyInterpreter(
+                AssembunnyInterpreter.parse_lines(inp))
+            computer.registers.update(registers)
+            computer.optimize()
+            computer.CLOCK_JUMPS = 1
+            computer.run_compiled(0, fname, max_seconds=0)
+            while computer.pos < len(computer.commands):
+                computer = AssembunnyInterpreter.resume(fname)
+        res = computer.registers['a']
+        print(f"T3.{tid}:", res == exp, exp, res)
+
     for tid, (inp, exp1, exp2) in enumerate(tests):
         if exp1 is not None:
             res1 = solve_p1(inp)
@@ -219,6 +941,27 @@ def run_real():
     print(exp2 == res2, exp2, res2)
 
 
+# Interpreting vs executing compiled commands vs executing the program
+# translated to python (see run_benchmark()), w/o optimization:
+# p.1: 0,72 --> 0,08 --> 0,02
+# p.2: 19,33 --> 2,48 --> 0,54
+
+
+def run_benchmark():
+    print("--- Benchmark ---")
+    commands = AssembunnyInterpreter.parse_lines(utils.load_input())
+    for part in (1, 2):
+        for engine in ['run', 'run_compiled', 'run_jit']:
+            computer = AssembunnyInterpreter(list(commands))
+            computer.registers['c'] = part - 1
+            t0 = time.perf_counter()
+            getattr(computer, engine)()
+            seconds = time.perf_counter() - t0
+            print(f"p.{part} {engine}: {seconds:.2f}s,",
+                  f"a={computer.registers['a']}")
+
+
 if __name__ == '__main__':
     run_tests()
     run_real()
+    # run_benchmark()
@@ -7,15 +7,276 @@
 import re
 import os
 import sys
-from typing import List, Tuple, Callable
+import mmap
+import math
+import time
+from typing import List, Tuple, Callable, Optional, Iterator, Sequence
 from hashlib import md5
-from collections import defaultdict
+from itertools import count, chain
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from aoc import utils
 
 
 DEBUG = False
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+STRETCH = 2016  # number of additional hashings in part 2
+
+
+class HashCache(object):
+    '''
+    Persistent cache of hashes computed for given salt and stretch (number of
+    additional hashings). Hashes of all indices of one (salt, stretch) pair
+    are stored in one file, that is memory-mapped: the hash of the i-th index
+    is stored as 16 raw bytes at the offset 16*i. Zero bytes stand for a hash
+    that has not been computed yet.
+    Size of the cache is bounded by <max_bytes>: the least recently used files
+    are deleted when the directory grows bigger than that; and indices that
+    do not fit into <max_bytes> are not cached at all.
+    '''
+
+    RECORD = 16
+    BLOCK = 65536 * RECORD  # the file grows in blocks
+    EMPTY = bytes(RECORD)
+
+    def __init__(self, salt: str, stretch: int, dirname: str = CACHE_DIR,
+                 max_bytes: int = 64 * 2**20):
+        self.max_bytes = max_bytes
+        os.makedirs(dirname, exist_ok=True)
+        key = md5(f"{salt}\t{stretch}".encode()).hexdigest()
+        self.fname = os.path.join(dirname, f"{key}.md5")
+        self.fd = open(self.fname, 'a+b')
+        os.utime(self.fname)  # mark as recently used
+        self.mm = None
+        self._map()
+        self._evict()
+
+    def _map(self):
+        if self.mm:
+            self.mm.close()
+        size = os.fstat(self.fd.fileno()).st_size
+        if size:
+            self.mm = mmap.mmap(self.fd.fileno(), size)
+
+    def _grow(self, size: int) -> bool:
+        '''Make the file big enough to hold <size> bytes, return False
+        if the size exceeds the limit'''
+        size = -(-size // self.BLOCK) * self.BLOCK
+        if size > self.max_bytes:
+            return False
+        self.fd.truncate(size)
+        self._map()
+        self._evict()
+        return True
+
+    def _evict(self):
+        '''Delete least recently used files of other salts and stretches
+        while the cache is bigger than allowed'''
+        dirname = os.path.dirname(self.fname)
+        paths = [os.path.join(dirname, fn) for fn in os.listdir(dirname)]
+        paths = sorted(paths, key=os.path.getmtime)
+        total = sum(os.path.getsize(path) for path in paths)
+        for path in paths:
+            if total <= self.max_bytes:
+                break
+            if path != self.fname:
+                total -= os.path.getsize(path)
+                os.remove(path)
+
+    def get(self, idx: int) -> Optional[str]:
+        '''Return the hash of given index or None if it is not cached'''
+        st = idx * self.RECORD
+        if self.mm and st + self.RECORD <= len(self.mm):
+            rec = self.mm[st:st+self.RECORD]
+            if rec != self.EMPTY:
+                return rec.hex()
+        return None
+
+    def put(self, idx: int, hcode: str):
+        st = idx * self.RECORD
+        if self.mm is None or st + self.RECORD > len(self.mm):
+            if not self._grow(st + self.RECORD):
+                return
+        self.mm[st:st+self.RECORD] = bytes.fromhex(hcode)
+
+    def close(self):
+        if self.mm:
+            self.mm.close()
+            self.mm = None
+        self.fd.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Hasher(object):
+    '''MD5 hash of salt and index, hashed <stretch> more times.
+    Unlike a closure, can be sent to a worker process.'''
+
+    batchsize = 1000  # suitable number of indices to hash at once
+
+    def __init__(self, salt: str, stretch: int = 0):
+        self.salt = salt
+        self.stretch = stretch
+
+    def __call__(self, i: int) -> str:
+        x = f'{self.salt}{i}'
+        for _ in range(0, 1 + self.stretch):
+            x = md5(x.lower().encode()).hexdigest()
+        return x
+
+    def batch(self, indices: Sequence[int]) -> List[str]:
+        return [self(i) for i in indices]
+
+
+# MD5 constants (RFC 1321)
+MD5_INIT = (0x67452301, 0xefcdab89, 0x98badcfe, 0x10325476)
+MD5_SHIFTS = ([7, 12, 17, 22] * 4 + [5, 9, 14, 20] * 4
+              + [4, 11, 16, 23] * 4 + [6, 10, 15, 21] * 4)
+MD5_K = [int(abs(math.sin(i + 1)) * 2**32) for i in range(64)]
+# index of the message word used at the i-th step
+MD5_G = ([i for i in range(16)]
+         + [(5*i + 1) % 16 for i in range(16, 32)]
+         + [(3*i + 5) % 16 for i in range(32, 48)]
+         + [7*i % 16 for i in range(48, 64)])
+
+
+def hex_table() -> np.ndarray:
+    '''For every pair of bytes (as a 16-bit little-endian number) pack
+    the 4 characters of its hex representation into a 32-bit little-endian
+    number'''
+    hexdigits = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+    hexdigits = hexdigits.astype(np.uint32)
+    pairs = np.arange(2**16, dtype=np.uint32)
+    lo, hi = pairs & 0xff, pairs >> 8
+    return (hexdigits[lo >> 4] | hexdigits[lo & 15] << 8
+            | hexdigits[hi >> 4] << 16 | hexdigits[hi & 15] << 24)
+
+
+HEX_TABLE = hex_table()
+
+
+def md5_stretch(digests: np.ndarray, rounds: int) -> np.ndarray:
+    '''
+    Given MD5 digests of many messages, as an array of shape (4, N) of 32-bit
+    words, hash the hex representation of each digest <rounds> times.
+    The hex representation of a digest is 32 characters long and, with
+    padding, fits into a single block of MD5, of which the last 8 words are
+    the same for all digests. Therefore MD5 is computed for all digests at
+    once, one step at a time. Hex encoding is done by a table lookup.
+    '''
+    # padding: 0x80 right after the message and the length of the message
+    # in bits in the 14th word
+    padding = {8: 0x80, 14: 32 * 8}
+    # constant parts of the steps: K plus the message word if it is padding
+    consts = [np.uint32((MD5_K[i] + padding.get(MD5_G[i], 0)) & 0xffffffff)
+              for i in range(64)]
+    init = [np.uint32(v) for v in MD5_INIT]
+    shifts = [(np.uint32(s), np.uint32(32 - s)) for s in MD5_SHIFTS]
+
+    words = list(digests)
+    for _ in range(rounds):
+        msg = []
+        for w in words:
+            msg.append(HEX_TABLE[w & 0xffff])
+            msg.append(HEX_TABLE[w >> 16])
+        a, b, c, d = [np.full_like(words[0], v) for v in init]
+        for i in range(64):
+            if i < 16:
+                f = (b & c) | (~b & d)
+            elif i < 32:
+                f = (d & b) | (~d & c)
+            elif i < 48:
+                f = b ^ c ^ d
+            else:
+                f = c ^ (b | ~d)
+            f += a
+            f += consts[i]
+            if MD5_G[i] < 8:
+                f += msg[MD5_G[i]]
+            sl, sr = shifts[i]
+            a, d, c = d, c, b
+            b = b + ((f << sl) | (f >> sr))
+        words = [a + init[0], b + init[1], c + init[2], d + init[3]]
+    return np.stack(words)
+
+
+class BatchHasher(Hasher):
+    '''
+    Same as Hasher but stretches hashes of many indices at once with
+    md5_stretch(): the interpreter overhead of each MD5 step is shared
+    by all indices of the batch.
+    '''
+
+    batchsize = 8192
+
+    def batch(self, indices: Sequence[int]) -> List[str]:
+        if not indices:
+            return []
+        raw = b''.join(md5(f'{self.salt}{i}'.lower().encode()).digest()
+                       for i in indices)
+        digests = np.frombuffer(raw, dtype='<u4').reshape(-1, 4).T
+        digests = md5_stretch(digests, self.stretch)
+        raw = digests.T.astype('<u4').tobytes()
+        return [raw[st:st+16].hex() for st in range(0, len(raw), 16)]
+
+
+def generate_hashes(hasher: Hasher, cache: Optional[HashCache] = None,
+                    workers: int = 1,
+                    batchsize: Optional[int] = None) -> Iterator[str]:
+    '''
+    Generate hashes of indices 0, 1, 2, ... in this order.
+    Hashes are computed in batches of <batchsize> indices (by default,
+    the batch size of the hasher), with Hasher.batch(). With more than one
+    worker, a batch is split between the processes of a pool. The next batch
+    is submitted when the consumer reaches the last chunk of the current
+    one: the other workers are idle by then, and at most one batch is
+    computed in vain if the consumer stops. Hashes found in the <cache> are
+    not computed.
+    '''
+    batchsize = batchsize or hasher.batchsize
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    pending = deque()
+
+    def submit(start: int):
+        indices = range(start, start + batchsize)
+        hcodes = [cache.get(i) if cache else None for i in indices]
+        missing = [i for i, hcode in zip(indices, hcodes) if hcode is None]
+        size = max(1, -(-len(missing) // workers))
+        chunks = [missing[st:st+size] for st in range(0, len(missing), size)]
+        if executor:
+            computed = executor.map(hasher.batch, chunks)
+            last_chunk = chunks[-1][0] if chunks else None
+        else:
+            computed = map(hasher.batch, chunks)  # lazy, computed on demand
+            last_chunk = None
+        pending.append(
+            (indices, hcodes, chain.from_iterable(computed), last_chunk))
+
+    try:
+        submit(0)
+        for start in count(batchsize, batchsize):
+            indices, hcodes, computed, last_chunk = pending.popleft()
+            for i, hcode in zip(indices, hcodes):
+                if i == last_chunk:
+                    submit(start)
+                if hcode is None:
+                    hcode = next(computed)
+                    if cache:
+                        cache.put(i, hcode)
+                yield hcode
+            if not pending:
+                submit(start)
+    finally:
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=True)
 
 
 def parse(hcode: str) -> Tuple[str, List[str]]:
@@ -55,26 +316,46 @@ def parse(hcode: str) -> Tuple[str, List[str]]:
 # 4) [confirmed1] real 120,66; user 119,89
 # 5) [confirmed2] real 121,26; user 120,59
 
+# w/o the cost of stretched hashing (see run_benchmark()):
+# 6) [confirmed1] p.1 0,63; p.2 (cached hashes) 0,54
+# 7) [confirmed3] p.1 0,14; p.2 (cached hashes) 0,10
+# Conclusion: indexing positions of quintuples pays off, as long as positions
+# are dropped as the window slides instead of being searched and removed.
 
-def solve2(hasher: Callable) -> int:
+
+def solve2(hasher: Hasher, cache: Optional[HashCache] = None,
+           workers: int = 1, indexed: bool = True) -> int:
     '''
     This algorithm addresses problems described in solve1():
     - it searches (forward) for Qx when looking at a Tx
+    Hashes are looked up in the <cache> (if given) before computing them.
+    Future hashes are computed in batches by <workers> processes (see
+    generate_hashes()).
+    If <indexed> is True, keys are confirmed with confirmed3() instead of
+    confirmed1().
     '''
     keys = []
     DISTANCE = 1000
 
     hashes = [None] * DISTANCE
     confirms = defaultdict(set)  # for confirmed2()
+    # for confirmed3(): hex digit -> positions of its quintuples in the window
+    quintuples = defaultdict(deque)
+    batchsize = max(DISTANCE, hasher.batchsize)
+    hcodes = generate_hashes(hasher, cache, workers, batchsize)
 
     def set_hash(pos: int):
+        # positions come in order, the same as the hashes
         addr = pos % DISTANCE
-        hcode = hasher(pos)
+        hcode = next(hcodes)
         hashes[addr] = (pos, hcode)
         if False:  # enable it for confirmed2()
             for ch in re.findall(r'(.)\1\1\1\1', hcode):
                 key = ch*3
                 confirms[key].add(pos)
+        if indexed:
+            for ch in set(re.findall(r'(.)\1\1\1\1', hcode)):
+                quintuples[ch].append(pos)
         return hcode
 
     def get_hash(pos: int):
@@ -94,6 +375,17 @@ def solve2(hasher: Callable) -> int:
             positions.difference_update(obsoletes)
         return bool(positions)
 
+    def confirmed3(key: str, pos: int):
+        # Positions are added in increasing order and never exceed
+        # pos+DISTANCE, hence, once positions up to <pos> are dropped, any
+        # remaining position confirms the key.
+        positions = quintuples[key[0]]
+        while positions and positions[0] <= pos:
+            positions.popleft()
+        return bool(positions)
+
+    confirmed = confirmed3 if indexed else confirmed1
+
     # create future hash sums
     for i in range(0, DISTANCE):
         set_hash(i)
@@ -104,8 +396,9 @@ def solve2(hasher: Callable) -> int:
         hsh = get_hash(i)
         set_hash(i+DISTANCE)  # create future hash sum
         m = re.search(r'(.)\1\1', hsh)
-        if m and confirmed1(m[0], i):
+        if m and confirmed(m[0], i):
             keys.append((i, m[0]))
+    hcodes.close()
 
     # print(keys)
     return keys[63][0]
@@ -190,21 +483,26 @@ def solve1(hasher: Callable) -> int:
 
 def solve_p1(salt: int) -> int:
     """Solution to the 1st part of the challenge"""
-    def hasher(i):
-        return md5(f"{salt}{i}".lower().encode()).hexdigest()
+    hasher = Hasher(salt)
     # return solve1(hasher)
     return solve2(hasher)
 
 
-def solve_p2(salt: int) -> int:
-    """Solution to the 2nd part of the challenge"""
-    def hasher(i):
-        x = f'{salt}{i}'
-        for _ in range(0, 2017):
-            x = md5(x.lower().encode()).hexdigest()
-        return x
+def solve_p2(salt: int, cache: bool = True,
+             workers: Optional[int] = None) -> int:
+    """Solution to the 2nd part of the challenge.
+    Stretched hashes are stored on disk (see HashCache) unless <cache> is
+    False, which makes subsequent runs with the same salt much faster.
+    Hashes are computed by <workers> processes, by default, as many as there
+    are CPUs."""
+    # hasher = Hasher(salt, STRETCH)
+    hasher = BatchHasher(salt, STRETCH)
+    workers = workers or os.cpu_count()
     # return solve1(hasher)
-    return solve2(hasher)
+    if not cache:
+        return solve2(hasher, None, workers)
+    with HashCache(salt, STRETCH) as hcache:
+        return solve2(hasher, hcache, workers)
 
 
 tests = [
@@ -241,6 +539,26 @@ def run_real():
     print(exp2 == res2, exp2, res2)
 
 
+def run_benchmark():
+    print("--- Benchmark ---")
+    salt = 'cuanljph'
+    hashers = [
+        ('p.1', Hasher(salt), None),
+        # from the cache, to see the time of confirming the keys
+        ('p.2', Hasher(salt, STRETCH), HashCache(salt, STRETCH))
+    ]
+    for part, hasher, cache in hashers:
+        for indexed in [False, True]:
+            t0 = time.perf_counter()
+            res = solve2(hasher, cache, 1, indexed)
+            seconds = time.perf_counter() - t0
+            name = 'confirmed3' if indexed else 'confirmed1'
+            print(f"{part} {name}: {seconds:.3f}s, {res}")
+        if cache:
+            cache.close()
+
+
 if __name__ == '__main__':
     run_tests()
     run_real()
+    # run_benchmark()
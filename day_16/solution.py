@@ -4,6 +4,9 @@
 # The solution implemented is straightforward and will probably fail for
 # larger disk sizes.
 # Is there a way to avoid generating the whole string?
+# -- Yes, see dragon_checksum(): each character of the checksum depends only
+# on the number of 1s in a chunk of the disk, which can be computed from the
+# seed and the positions of the chunk.
 #
 
 import re
@@ -11,6 +14,8 @@ import os
 import sys
 from typing import List
 
+import numpy as np
+
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from aoc import utils
 
@@ -40,14 +45,115 @@ def checksum(s: str):
     return chks
 
 
+def extend_array(a: str, maxlen=20) -> np.ndarray:
+    '''Same as extend() but builds the data in an array of 0s and 1s.
+    Every step writes the separator and the inverted and reversed copy of
+    the data right after the data, in place.'''
+    length = len(a)
+    size = length
+    while size < maxlen:
+        size = 2 * size + 1
+    data = np.zeros(size, dtype=np.uint8)
+    data[:length] = np.frombuffer(a.encode(), dtype=np.uint8) - ord('0')
+    while length < maxlen:
+        data[length] = 0
+        data[length+1:2*length+1] = 1 - data[length-1::-1]
+        length = 2 * length + 1
+    return data[:maxlen]
+
+
+def checksum_array(data: np.ndarray) -> str:
+    '''Same as checksum() but for an array of 0s and 1s, as produced by
+    extend_array(). Every round compares all pairs at once.'''
+    while True:
+        data = (data[0:-1:2] == data[1::2]).astype(np.uint8)
+        if len(data) % 2:
+            break
+    return (data + ord('0')).tobytes().decode()
+
+
+def count_dragon_ones(m: int) -> int:
+    '''Count 1s among the first <m> separators of the dragon curve.
+    The data extended several times looks like this:
+      a 0 b 0 a 1 b 0 a 0 b 1 a 1 b ...
+    where b is reversed and inverted a. The i-th separator (from 1) is 1 if
+    i = 2^k * j, where j is odd and j % 4 == 3. For every k, there are
+    (m // 2^k + 1) // 4 such j.
+    '''
+    cnt = 0
+    while m:
+        cnt += (m + 1) // 4
+        m >>= 1
+    return cnt
+
+
+def ones_in_prefixes(a: str):
+    '''For both a and b (reversed and inverted a), count 1s in their
+    prefixes of all lengths from 0 to len(a)'''
+    b = ''.join('0' if ch == '1' else '1' for ch in reversed(a))
+    counts = []
+    for s in (a, b):
+        cnts = [0]
+        for ch in s:
+            cnts.append(cnts[-1] + (ch == '1'))
+        counts.append(cnts)
+    return counts
+
+
+def count_ones(a: str, n: int, prefix_ones=None) -> int:
+    '''Count 1s in the first <n> characters of the data obtained by
+    extending <a> (see extend()), without generating the data.'''
+    if prefix_ones is None:
+        prefix_ones = ones_in_prefixes(a)
+    length = len(a)
+    n_blocks, rest = divmod(n, length + 1)
+    # full blocks: a, b, a, b, ... and separators between them
+    cnt = ((n_blocks + 1) // 2 * prefix_ones[0][-1]
+           + n_blocks // 2 * prefix_ones[1][-1]
+           + count_dragon_ones(n_blocks))
+    # beginning of the next block
+    cnt += prefix_ones[n_blocks % 2][rest]
+    return cnt
+
+
+def dragon_checksum(a: str, disksize: int) -> str:
+    '''
+    Compute the checksum of the data of length <disksize> obtained by extending
+    <a>, without generating the data.
+    Reducing a chunk of 2^k characters k times produces 1 if the chunk has
+    an even number of 1s, and 0 otherwise. Reduction stops when the length of
+    the checksum becomes odd, that is, the chunk is the largest power of 2 that
+    divides <disksize>.
+    '''
+    assert disksize % 2 == 0, f"Odd disk size is not supported: {disksize}"
+    chunk = disksize & -disksize
+    prefix_ones = ones_in_prefixes(a)
+    chks = []
+    prev = 0
+    for end in range(chunk, disksize + 1, chunk):
+        curr = count_ones(a, end, prefix_ones)
+        chks.append('0' if (curr - prev) % 2 else '1')
+        prev = curr
+    return ''.join(chks)
+
+
 print(extend('10000', 20) == '10000011110010000111')
 print(checksum('110010110100') == '100')
 print(checksum('10000011110010000111') == '01100')
+print(checksum_array(extend_array('10000', 20)) == '01100')
+print(dragon_checksum('10000', 20) == '01100')
+
 
+# p.2
+# - checksum(extend()):             real 10,59
+# - checksum_array(extend_array()): real 0,10
+# - dragon_checksum():              real 0,00
 
 def solve_p1(seed: str, maxlen: int) -> str:
     """Solution to the 1st part of the challenge"""
-    return checksum(extend(seed, maxlen))
+    # return checksum(extend(seed, maxlen))
+    # return checksum_array(extend_array(seed, maxlen))
+    return dragon_checksum(seed, maxlen)
 
 
 def solve_p2(lines: List[str]) -> int:
@@ -44,8 +44,8 @@ def build(prev: List[int]) -> List[int]:
     return newline
 
 
-def solve_p1(line: str, n_lines: int) -> int:
-    """Solution to the 1st part of the challenge"""
+def solve1(line: str, n_lines: int) -> int:
+    '''Naive implementation'''
     curr = digitize(line.strip())
     cnt = sum(curr)
     for i in range(0, n_lines-1):
@@ -54,15 +54,97 @@ def solve_p1(line: str, n_lines: int) -> int:
     return cnt
 
 
+def bitize(s: str) -> int:
+    '''Convert string to an integer, in which a bit is set if the tile at
+    the corresponding position is a trap ^. The leftmost tile becomes the most
+    significant bit.'''
+    return int(s.replace('.', '0').replace('^', '1'), 2)
+
+
+def solve2(line: str, n_lines: int) -> int:
+    '''
+    All four rules in TRAPS boil down to: a tile is a trap if exactly one of
+    its left and right neighbours is a trap, that is, left XOR right.
+    With a row stored as bits of an integer, the whole next row is computed
+    by shifting the row by one tile in each direction and XORing the results.
+    Traps in a row are counted with popcount.
+    '''
+    line = line.strip()
+    width = len(line)
+    mask = (1 << width) - 1  # drops the tile shifted out to the left
+    row = bitize(line)
+    n_traps = 0
+    for _ in range(n_lines):
+        n_traps += row.bit_count()
+        row = ((row << 1) ^ (row >> 1)) & mask
+    return width * n_lines - n_traps
+
+
+def solve3(line: str, n_lines: int, max_states: int = 10**6) -> int:
+    '''
+    Same as solve2() but remembers the rows seen so far. Every next row
+    depends only on the previous one, therefore as soon as a row repeats,
+    the rows between its two occurrences form a cycle that repeats until
+    the end, and the number of safe tiles in the remaining rows is computed
+    arithmetically.
+    Not every input benefits from it: the cycle of a row of width 100 (like
+    in the real input) is too long to be found. At most <max_states> rows are
+    remembered, after that the search for a cycle is abandoned.
+    '''
+    line = line.strip()
+    width = len(line)
+    mask = (1 << width) - 1
+    row = bitize(line)
+
+    seen = {}     # row -> its index
+    n_safe = [0]  # n_safe[i] -- number of safe tiles in the first i rows
+    for i in range(n_lines):
+        if row in seen or len(seen) >= max_states:
+            break
+        seen[row] = i
+        n_safe.append(n_safe[-1] + width - row.bit_count())
+        row = ((row << 1) ^ (row >> 1)) & mask
+    else:
+        return n_safe[-1]
+
+    if row not in seen:
+        # cycle is too long
+        return n_safe[-1] + solve2(format(row, f'0{width}b'), n_lines - i)
+
+    # rows start..i-1 repeat until the end
+    start = seen[row]
+    period = i - start
+    n_cycles, rest = divmod(n_lines - i, period)
+    return (n_safe[i]
+            + n_cycles * (n_safe[i] - n_safe[start])
+            + n_safe[start + rest] - n_safe[start])
+
+# solve1:
+# - real 35,78; user 35,78
+# solve2:
+# - real 0,10; user 0,10 (10^7 rows: 2,4)
+
+
+def solve_p1(line: str, n_lines: int, cycles: bool = False) -> int:
+    """Solution to the 1st part of the challenge.
+    Set <cycles> to True to look for repeating rows, which makes a difference
+    for a very large number of rows <n_lines>"""
+    if cycles:
+        return solve3(line, n_lines)
+    # return solve1(line, n_lines)
+    return solve2(line, n_lines)
+
+
 def solve_p2(line: str) -> int:
     """Solution to the 2nd part of the challenge"""
     return solve_p1(line, 400000)
 
-# real 35,78; user 35,78
 
 tests = [
     (('..^^.', 3), 6, None),
-    (('.^^.^.^^^^', 10), 38, None)
+    (('.^^.^.^^^^', 10), 38, None),
+    (('.^^.^.^^^^', 10, True), 38, None),
+    (('.^^.^.^^^^', 10**6, True), 4838708, None),
 ]
 
 
@@ -7,7 +7,7 @@
 import re
 import os
 import sys
-from typing import List
+from typing import List, Iterable, Iterator
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from aoc import utils
@@ -16,13 +16,13 @@ DAY = '20'
 DEBUG = False
 
 
-def parse(lines: List[str]):
-    ranges = [list(map(int, line.strip().split('-')))
-              for line in lines if line]
-    return ranges
+def parse(lines: Iterable[str]) -> Iterator[List[int]]:
+    for line in lines:
+        if line:
+            yield list(map(int, line.strip().split('-')))
 
 
-def solve_p1(lines: List[str]) -> int:
+def solve_p1(lines: Iterable[str]) -> int:
     """Solution to the 1st part of the challenge"""
     ranges = sorted(parse(lines))
     # print(ranges)
@@ -36,7 +36,7 @@ def solve_p1(lines: List[str]) -> int:
 IPS = [0, 4294967295]
 
 
-def merge(ranges: List[List[int]]) -> List[List[int]]:
+def merge(ranges: Iterable[List[int]]) -> List[List[int]]:
     merged = [[0, 0]]
 
     for curr in sorted(ranges):
@@ -51,7 +51,7 @@ def merge(ranges: List[List[int]]) -> List[List[int]]:
     return merged
 
 
-def solve_p2(lines: List[str]) -> int:
+def solve_p2(lines: Iterable[str]) -> int:
     """Solution to the 2nd part of the challenge"""
     ranges = merge(parse(lines))
     # print(ranges)
@@ -86,16 +86,14 @@ def run_tests():
 
 
 def run_real():
-    lines = utils.load_input()
-
     print(f"--- Day {DAY} p.1 ---")
     exp1 = 32259706
-    res1 = solve_p1(lines)
+    res1 = solve_p1(utils.iter_input())
     print(exp1 == res1, exp1, res1)
 
     print(f"--- Day {DAY} p.2 ---")
     exp2 = 113
-    res2 = solve_p2(lines)
+    res2 = solve_p2(utils.iter_input())
     print(exp2 == res2, exp2, res2)
 
 
@@ -6,7 +6,9 @@
 # > time -p pypy3 solution.py
 #    user 176,21
 # Alternatively, implement optimization (search below for ideas, also in
-# day 12)
+# day 12). With nested loops rewritten as multiplication (see optimize()
+# in day 12):
+#    real 0,14
 
 
 import re
@@ -21,6 +23,7 @@ from day_12.solution import AssembunnyInterpreter as BaseInterpreter
 
 DAY = '23'
 DEBUG = False
+PROFILE = False
 
 
 class AssembunnyInterpreter(BaseInterpreter):
@@ -30,26 +33,45 @@ class AssembunnyInterpreter(BaseInterpreter):
         arg = self.value(cmd[1])
         pos = self.pos + arg
         # print(cmd, "modifies line", pos)
-        if pos < len(self.commands):
-            other_cmd = self.commands[pos]
+        if 0 <= pos < len(self.commands):
+            # the command may have been replaced by optimize()
+            self.deoptimize(pos)
+            other_cmd = new_cmd = self.commands[pos]
             if self.debug:
                 print("Rewriting", pos, other_cmd)
             if len(other_cmd) == 2:
                 # ex: For one-argument instructions, inc becomes dec, and all
                 # other one-argument instructions become inc.
                 if other_cmd[0] == 'inc':
-                    self.commands[pos] = ('dec', other_cmd[1])
+                    new_cmd = ('dec', other_cmd[1])
                 else:
-                    self.commands[pos] = ('inc', other_cmd[1])
+                    new_cmd = ('inc', other_cmd[1])
             if len(other_cmd) == 3:
                 # For two-argument instructions, jnz becomes cpy, and all other
                 # two-instructions become jnz.
                 if other_cmd[0] == 'jnz':
-                    self.commands[pos] = ('cpy',) + other_cmd[1:]
+                    new_cmd = ('cpy',) + other_cmd[1:]
                 else:
-                    self.commands[pos] = ('jnz',) + other_cmd[1:]
+                    new_cmd = ('jnz',) + other_cmd[1:]
+            self.replace(pos, [new_cmd])
+            if (new_cmd[0] == 'jnz' and isinstance(new_cmd[2], int)
+                    and self.fused(pos + new_cmd[2], True)):
+                self.deoptimize(pos + new_cmd[2])
             if self.debug:
                 print("Rewritten", self.commands[pos])
+            if self.optimized:
+                # the new command can complete a block that can be optimized:
+                # one that matches PATTERNS or a loop that summarize() can
+                # handle, whose body is a run of inc/dec/cpy/add of any
+                # length. The block must start after the current command,
+                # otherwise execution continues inside the block.
+                longest = max(len(p.split(';')) for p, _ in self.PATTERNS)
+                start = pos
+                while (start > 0 and self.commands[start-1][0]
+                       in ('inc', 'dec', 'cpy', 'add')):
+                    start -= 1
+                start = min(start, pos - longest + 1)
+                self.optimize(max(start, self.pos + 1), pos + 1)
         # self.inspect()
 
 #https://www.reddit.com/r/adventofcode/comments/5jvbzt/2016_day_23_solutions/
@@ -72,12 +94,18 @@ def solve_p1(lines: List[str], part: int = 0) -> int:
 
     computer = AssembunnyInterpreter(commands)
     computer.debug = DEBUG
+    computer.profile = PROFILE
     if part == 1:
         computer.registers['a'] = 7
     elif part == 2:
         computer.registers['a'] = 12
 
-    computer.run()
+    computer.optimize()
+    if computer.profile:
+        computer.run()
+    else:
+        # computer.run()
+        computer.run_compiled()
 
     return computer.registers['a']
 
@@ -96,8 +124,45 @@ dec a
 dec a
 """
 
+# toggles a command in the loop that is optimized to addition
+text_2 = """cpy 4 d
+cpy 1 c
+tgl c
+inc a
+dec d
+jnz d -2
+"""
+
+# toggles a command that completes a loop that can be optimized
+text_3 = """cpy 5 d
+cpy 2 c
+tgl c
+inc a
+inc d
+jnz d -2
+"""
+
+# toggles a command before itself, which completes a loop that starts at
+# the current `tgl`
+text_4 = """cpy 4 b
+cpy 1 c
+cpy 3 a
+inc c
+tgl 2
+tgl d
+inc a
+cpy b b
+inc c
+jnz d -4
+cpy -3 c
+inc b
+"""
+
 tests = [
     (text_1.split('\n'), 3, None),
+    (text_2.split('\n'), -4, None),
+    (text_3.split('\n'), 5, None),
+    (text_4.split('\n'), 2, None),
 ]
 
 def run_tests():
@@ -127,6 +192,17 @@ def run_real():
     print(exp2 == res2, exp2, res2)
 
 
+def run_sweep(values=range(6, 13)):
+    '''Run the program for several initial values of register a'''
+    print("--- Sweep ---")
+    commands = AssembunnyInterpreter.parse_lines(utils.load_input())
+    inits = [{'a': a} for a in values]
+    for init, regs in AssembunnyInterpreter.run_batch(commands, inits):
+        regs_str = ' '.join(f"{r}={v}" for r, v in regs.items())
+        print(f"a={init['a']:<4}", regs_str)
+
+
 if __name__ == '__main__':
     run_tests()
     run_real()
+    # run_sweep()